@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+re_max_age = re.compile(r"max-age=(\d+)")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class GoogleTokenError(Exception):
+    """
+    Raised when an `id_token` cannot be verified.
+    """
+
+
+def get_session():
+    """
+    Returns the HTTP session shared by all Google calls, so connections to
+    Google are pooled and kept alive between logins.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Only idempotent requests (the JWKS fetch) are retried.
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=settings.GOOGLE_OAUTH2_POOL_SIZE,
+                    max_retries=Retry(total=2, backoff_factor=0.2),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_max_age(response):
+    """
+    Returns how long a response may be cached for, from its Cache-Control header.
+    """
+    match = re_max_age.search(response.headers.get("Cache-Control", ""))
+    if match is None or "no-store" in response.headers.get("Cache-Control", ""):
+        return 0
+    age = int(response.headers.get("Age", 0) or 0)
+    return max(int(match.group(1)) - age, 0)
+
+
+class GoogleKeySet:
+    """
+    Google's token signing keys, kept in memory for as long as Google's
+    Cache-Control allows.
+
+    The keys are fetched again once they expire, or when a token is signed
+    with an unknown key (Google rotated its keys), at most once every
+    `min_refresh_interval` seconds so bad tokens cannot trigger a fetch each.
+    """
+
+    min_refresh_interval = 60
+
+    def __init__(self):
+        self.keys = {}
+        self.expires_at = 0
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        if now >= self.expires_at or (kid not in self.keys and self.can_refresh(now)):
+            with self.lock:
+                if now >= self.expires_at or (
+                    kid not in self.keys and self.can_refresh(now)
+                ):
+                    self.refresh(now)
+        try:
+            return self.keys[kid]
+        except KeyError:
+            raise GoogleTokenError("Unknown signing key.")
+
+    def can_refresh(self, now):
+        return (
+            self.fetched_at is None
+            or now - self.fetched_at >= self.min_refresh_interval
+        )
+
+    def refresh(self, now):
+        response = get_session().get(
+            settings.GOOGLE_OAUTH2_JWKS_URL, timeout=settings.GOOGLE_OAUTH2_TIMEOUT
+        )
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json()["keys"]:
+            key = jwt.PyJWK(jwk)
+            keys[key.key_id] = key
+        self.keys = keys
+        self.fetched_at = now
+        self.expires_at = now + get_max_age(response)
+
+    def clear(self):
+        with self.lock:
+            self.keys = {}
+            self.expires_at = 0
+            self.fetched_at = None
+
+
+google_keys = GoogleKeySet()
+
+
+def exchange_code(code):
+    """
+    Exchanges an authorization code for Google's tokens.
+    """
+    response = get_session().post(
+        settings.GOOGLE_OAUTH2_TOKEN_URL,
+        data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": settings.GOOGLE_OAUTH2_REDIRECT_URI,
+            "client_id": settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
+            "client_secret": settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET,
+        },
+        timeout=settings.GOOGLE_OAUTH2_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def verify_id_token(id_token):
+    """
+    Verifies an `id_token` locally: signature against Google's keys, audience
+    (our client id), issuer and expiry. Returns its claims.
+    """
+    try:
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        key = google_keys.get_key(kid)
+        return jwt.decode(
+            id_token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            audience=settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
+            issuer=GOOGLE_ISSUERS,
+            leeway=settings.GOOGLE_OAUTH2_CLOCK_SKEW,
+        )
+    except jwt.PyJWTError as e:
+        raise GoogleTokenError(str(e))
+
+
+def get_user_info(access_token):
+    """
+    Fetches the user's profile from the userinfo endpoint. Only needed when
+    the token response has no `id_token`.
+    """
+    response = get_session().get(
+        settings.GOOGLE_OAUTH2_USERINFO_URL,
+        headers={"Authorization": f"Bearer {access_token}"},
+        timeout=settings.GOOGLE_OAUTH2_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()
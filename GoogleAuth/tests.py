@@ -1,3 +1,213 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from authentication.tests import TEST_SETTINGS
+
+from .client import google_keys
+
+CLIENT_ID = "client-id.apps.googleusercontent.com"
+
+
+class StubGoogle:
+    """
+    Local stand-in for Google's token and JWKS endpoints, serving id_tokens
+    signed with a throwaway RSA key.
+    """
+
+    def __init__(self):
+        self.private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        self.kid = "key-1"
+        self.claims = {}
+        self.jwks_max_age = 3600
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_jwks(self):
+        jwk = json.loads(
+            jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key())
+        )
+        jwk.update({"kid": self.kid, "alg": "RS256", "use": "sig"})
+        return {"keys": [jwk]}
+
+    def get_id_token(self):
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com",
+            "aud": CLIENT_ID,
+            "sub": "1234567890",
+            "email": "jane@example.com",
+            "email_verified": True,
+            "name": "Jane Doe",
+            "iat": now,
+            "exp": now + 3600,
+            **self.claims,
+        }
+        return jwt.encode(
+            claims, self.private_key, algorithm="RS256", headers={"kid": self.kid}
+        )
+
+    def get_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.requests.append(self.path)
+                self.send_json(
+                    {"access_token": "access", "id_token": stub.get_id_token()}
+                )
+
+            def do_GET(self):
+                stub.requests.append(self.path)
+                self.send_json(
+                    stub.get_jwks(),
+                    {"Cache-Control": f"public, max-age={stub.jwks_max_age}"},
+                )
+
+            def send_json(self, data, headers=None):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class GoogleLoginTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.google = StubGoogle()
+        cls.google.start()
+        cls.settings_override = override_settings(
+            **TEST_SETTINGS,
+            SOCIAL_AUTH_GOOGLE_OAUTH2_KEY=CLIENT_ID,
+            GOOGLE_OAUTH2_TOKEN_URL=f"{cls.google.url}/token",
+            GOOGLE_OAUTH2_JWKS_URL=f"{cls.google.url}/certs",
+            GOOGLE_OAUTH2_USERINFO_URL=f"{cls.google.url}/userinfo",
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.google.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        google_keys.clear()
+        self.google.claims = {}
+        self.google.jwks_max_age = 3600
+        self.google.requests.clear()
+        self.client = APIClient()
+
+    def login(self):
+        return self.client.get("/complete/google/", {"code": "auth-code"})
+
+    def test_login_verifies_id_token_locally(self):
+        response = self.login()
+
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertIn("access_token", response.json()["data"])
+        user = User.objects.get(email="jane@example.com")
+        self.assertEqual(user.name, "Jane Doe")
+        # No userinfo call, the profile comes from the id_token.
+        self.assertEqual(self.google.requests, ["/token", "/certs"])
+
+    def test_keys_are_cached(self):
+        self.login()
+        self.login()
+
+        self.assertEqual(self.google.requests, ["/token", "/certs", "/token"])
+
+    def test_keys_are_refetched_when_expired(self):
+        self.google.jwks_max_age = 0
+        self.login()
+        self.login()
+
+        self.assertEqual(self.google.requests, ["/token", "/certs", "/token", "/certs"])
+
+    def test_keys_are_refetched_on_rotation(self):
+        self.login()
+        self.google.kid = "key-2"
+        try:
+            with mock.patch.object(google_keys, "min_refresh_interval", 0):
+                response = self.login()
+        finally:
+            self.google.kid = "key-1"
+
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(self.google.requests.count("/certs"), 2)
+
+    def test_unknown_keys_are_refetched_at_most_once_a_minute(self):
+        self.login()
+        self.google.kid = "key-2"
+        try:
+            response = self.login()
+        finally:
+            self.google.kid = "key-1"
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.google.requests.count("/certs"), 1)
+
+    def test_rejects_other_audience(self):
+        self.google.claims = {"aud": "someone-else"}
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+    def test_rejects_expired_token(self):
+        self.google.claims = {"exp": int(time.time()) - 3600}
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_unverified_email(self):
+        self.google.claims = {"email_verified": False}
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.exists())
+
+    def test_rejects_missing_code(self):
+        response = self.client.get("/complete/google/")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.google.requests, [])
@@ -1,12 +1,14 @@
 import requests
-from django.conf import settings
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from authentication.models import User
+from authentication.tokens import RefreshToken
 from common.response import error_response, success_response
 
+from .client import (GoogleTokenError, exchange_code, get_user_info,
+                     verify_id_token)
+
 
 class GoogleLoginView(APIView):
     def get(self, request):
@@ -17,28 +19,16 @@ class GoogleLoginView(APIView):
                 "Authorization code not provided", code=status.HTTP_400_BAD_REQUEST
             )
 
-        # Prepare the request to exchange the code for tokens
-        token_url = "https://oauth2.googleapis.com/token"
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": "http://localhost:8000/complete/google/",  # Ensure this matches what is registered in Google Developer Console
-            "client_id": settings.SOCIAL_AUTH_GOOGLE_OAUTH2_KEY,
-            "client_secret": settings.SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET,
-        }
-
         try:
-            # Send POST request to exchange authorization code for tokens
-            response = requests.post(token_url, data=data)
-            response.raise_for_status()  # Raise an exception for 4xx/5xx responses
-            tokens = response.json()
+            # Exchange the authorization code for tokens
+            tokens = exchange_code(code)
 
-            # Retrieve user info from Google using the access token
-            user_info_url = "https://www.googleapis.com/oauth2/v1/userinfo"
-            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
-            user_info_response = requests.get(user_info_url, headers=headers)
-            user_info_response.raise_for_status()
-            user_info = user_info_response.json()
+            # The id_token is signed by Google, so the user's details are read
+            # from it locally instead of calling the userinfo endpoint.
+            if "id_token" in tokens:
+                user_info = verify_id_token(tokens["id_token"])
+            else:
+                user_info = get_user_info(tokens["access_token"])
 
             # Check if the user has provided email
             email = user_info.get("email")
@@ -46,6 +36,10 @@ class GoogleLoginView(APIView):
                 return error_response(
                     "Email not provided by Google", code=status.HTTP_400_BAD_REQUEST
                 )
+            if user_info.get("email_verified") is False:
+                return error_response(
+                    "Email not verified by Google", code=status.HTTP_400_BAD_REQUEST
+                )
 
             # Create or get the user in the database using your custom User model
             user, created = User.objects.get_or_create(
@@ -69,6 +63,10 @@ class GoogleLoginView(APIView):
                 },
             )
 
+        except GoogleTokenError as token_err:
+            return error_response(
+                f"Invalid id_token: {token_err}", code=status.HTTP_400_BAD_REQUEST
+            )
         except requests.exceptions.HTTPError as http_err:
             return error_response(
                 f"HTTP error occurred: {http_err}", code=status.HTTP_400_BAD_REQUEST
@@ -2,13 +2,23 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from authentication.views import (SendPasswordResetEmailView,
+                                  TokenIntrospectionView,
                                   UserChangePasswordView, UserLoginView,
                                   UserLogoutView, UserPasswordResetView,
                                   UserProfileView, UserRegistrationView)
-from products.views import ProductDetailView, ProductListView
+from common.metrics import MetricsView
+from products.views import (AsyncProductDetailView, AsyncProductListView,
+                            ProductBulkView, ProductDetailView,
+                            ProductExportView, ProductListView,
+                            ProductSearchView)
 
 urlpatterns = [
     path("user/token/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
+    path(
+        "user/token/introspect/",
+        TokenIntrospectionView.as_view(),
+        name="token-introspect",
+    ),
 ]
 
 urlpatterns += [
@@ -37,4 +47,17 @@ urlpatterns += [
 urlpatterns += [
     path("products/", ProductListView.as_view(), name="product-list"),
     path("products/<int:pk>/", ProductDetailView.as_view(), name="product-detail"),
+    path("products/bulk/", ProductBulkView.as_view(), name="product-bulk"),
+    path("products/export/", ProductExportView.as_view(), name="product-export"),
+    path("products/search/", ProductSearchView.as_view(), name="product-search"),
+    path("products/async/", AsyncProductListView.as_view(), name="product-list-async"),
+    path(
+        "products/async/<int:pk>/",
+        AsyncProductDetailView.as_view(),
+        name="product-detail-async",
+    ),
+]
+
+urlpatterns += [
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
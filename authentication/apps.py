@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authentication"
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from common import metrics
+        from common.hashing import password_hashing
+
+        from . import signals  # noqa: F401
+        from .outstanding import outstanding_tokens
+        from .purge import token_purger
+
+        metrics.register("password_hashing", password_hashing.snapshot)
+        metrics.register("outstanding_tokens", outstanding_tokens.snapshot)
+        # Servers start purging expired tokens with their first request.
+        request_started.connect(token_purger.ensure_worker, dispatch_uid="token_purge")
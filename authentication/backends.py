@@ -0,0 +1,89 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import get_password_digest, user_cache
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication usable from async views as well.
+
+    Sync views go through `authenticate()` as before. Async views await
+    `aauthenticate()`, which loads the user with the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """
+        Async version of `get_user()`, with the same checks.
+        """
+        user_id = self.get_user_id(validated_token)
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return self.check_user(user, validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, validated_token):
+        """
+        Runs the checks `get_user()` makes on the user it loaded.
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_password_digest(user):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """
+    JWT authentication that loads users through `user_cache`, so most
+    authenticated requests make no user query.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user = user_cache.get(self.get_user_id(validated_token))
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        try:
+            user = await user_cache.aget(self.get_user_id(validated_token))
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return self.check_user(user, validated_token)
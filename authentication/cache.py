@@ -0,0 +1,193 @@
+import copy
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from common.async_cache import async_cache
+
+from .models import User
+
+# An evicted user is marked as such for this many seconds, so a reader that
+# loaded it before the eviction cannot put the old version back in the cache.
+USER_EVICTION_GRACE = 10
+EVICTED = "evicted"
+
+# The fields cached for each user. The password hash is left out, so it never
+# reaches Redis; the revoke check gets the digest it compares instead.
+CACHED_FIELDS = [
+    field.attname for field in User._meta.concrete_fields if field.name != "password"
+]
+
+
+def get_password_digest(user):
+    """
+    Returns the digest of the user's password hash that `CHECK_REVOKE_TOKEN`
+    compares with the token's claim, without loading the hash of cached users.
+    """
+    digest = getattr(user, "password_digest", None)
+    if digest is None:
+        digest = get_md5_hash_password(user.password)
+    return digest
+
+
+class UserCache:
+    """
+    Two tier cache of the users authenticated by `CachedJWTAuthentication`.
+
+    The first tier is a small TTL/LRU cache in process memory, holding up to
+    `USER_CACHE_LOCAL_SIZE` users for `USER_CACHE_LOCAL_TTL` seconds. The
+    second is the Django cache (Redis), shared by every worker, holding users
+    for `USER_CACHE_TIMEOUT` seconds. Saving or deleting a user evicts it from
+    the shared cache and this process' memory; other processes may keep their
+    copy until it expires, so keep the local TTL short. `QuerySet.update()`
+    sends no signals, so code updating users that way must `evict()` them.
+    Users read after a miss are only cached with `cache.add`, so they never
+    replace an eviction that happened since they were read.
+
+    Only `CACHED_FIELDS` and a digest of the password hash are cached. The
+    password is deferred on the users returned, and loaded from the database
+    if read. Callers get their own copy of the user, so changes made while
+    handling a request never leak into the cache.
+    """
+
+    def __init__(self):
+        self.local = None
+        self.lock = threading.Lock()
+
+    def get_local(self):
+        if self.local is None:
+            with self.lock:
+                if self.local is None:
+                    self.local = TTLCache(
+                        maxsize=settings.USER_CACHE_LOCAL_SIZE,
+                        ttl=settings.USER_CACHE_LOCAL_TTL,
+                    )
+        return self.local
+
+    def get_key(self, user_id):
+        return f"auth:user-fields:{user_id}"
+
+    def to_entry(self, user):
+        return (
+            [getattr(user, name) for name in CACHED_FIELDS],
+            get_md5_hash_password(user.password),
+        )
+
+    def from_entry(self, entry):
+        values, password_digest = entry
+        user = User.from_db(router.db_for_read(User), CACHED_FIELDS, values)
+        user.password_digest = password_digest
+        return user
+
+    def get(self, user_id):
+        """
+        Returns the user with the given `USER_ID_FIELD` value, from the cache or
+        the database.
+        Raises `User.DoesNotExist` if there is none.
+        """
+        user = self.get_cached(user_id)
+        if user is None:
+            entry = cache.get(self.get_key(user_id))
+            if entry is None or entry == EVICTED:
+                entry = self.to_entry(
+                    User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+                )
+                filled = cache.add(
+                    self.get_key(user_id), entry, settings.USER_CACHE_TIMEOUT
+                )
+            else:
+                filled = True
+            user = self.from_entry(entry)
+            if filled:
+                self.set_local(user_id, user)
+        return copy.copy(user)
+
+    def get_many(self, user_ids):
+        """
+        Returns a dict of the users with the given `USER_ID_FIELD` values, with
+        one cache `get_many` (MGET) for those not in memory and one query for
+        those not cached. Users that do not exist are left out.
+        """
+        users = {}
+        for user_id in set(user_ids):
+            user = self.get_cached(user_id)
+            if user is not None:
+                users[user_id] = user
+
+        missing = {
+            self.get_key(user_id): user_id
+            for user_id in user_ids
+            if user_id not in users
+        }
+        entries = {}
+        if missing:
+            for key, entry in cache.get_many(missing).items():
+                if entry != EVICTED:
+                    entries[missing.pop(key)] = entry
+        filled = set(entries)
+        if missing:
+            ids = {str(user_id): user_id for user_id in missing.values()}
+            for user in User.objects.filter(
+                **{f"{api_settings.USER_ID_FIELD}__in": ids.values()}
+            ):
+                user_id = ids[str(getattr(user, api_settings.USER_ID_FIELD))]
+                entries[user_id] = self.to_entry(user)
+                if cache.add(
+                    self.get_key(user_id), entries[user_id], settings.USER_CACHE_TIMEOUT
+                ):
+                    filled.add(user_id)
+
+        for user_id, entry in entries.items():
+            users[user_id] = self.from_entry(entry)
+            if user_id in filled:
+                self.set_local(user_id, users[user_id])
+        return {user_id: copy.copy(user) for user_id, user in users.items()}
+
+    async def aget(self, user_id):
+        """
+        Async version of `get()`.
+        """
+        user = self.get_cached(user_id)
+        if user is None:
+            entry = await async_cache.get(self.get_key(user_id))
+            if entry is None or entry == EVICTED:
+                entry = self.to_entry(
+                    await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+                )
+                filled = await async_cache.add(
+                    self.get_key(user_id), entry, settings.USER_CACHE_TIMEOUT
+                )
+            else:
+                filled = True
+            user = self.from_entry(entry)
+            if filled:
+                self.set_local(user_id, user)
+        return copy.copy(user)
+
+    def get_cached(self, user_id):
+        local = self.get_local()
+        with self.lock:
+            return local.get(user_id)
+
+    def set_local(self, user_id, user):
+        local = self.get_local()
+        with self.lock:
+            local[user_id] = user
+
+    def evict(self, user_id):
+        local = self.get_local()
+        with self.lock:
+            local.pop(user_id, None)
+        cache.set(self.get_key(user_id), EVICTED, USER_EVICTION_GRACE)
+
+    def clear(self):
+        with self.lock:
+            self.local = None
+
+
+user_cache = UserCache()
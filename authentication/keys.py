@@ -0,0 +1,198 @@
+import functools
+import hashlib
+import json
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+def get_algorithm(public_key):
+    """
+    Returns the JWT algorithm tokens are signed with for the given key type.
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    if (
+        isinstance(public_key, ec.EllipticCurvePublicKey)
+        and public_key.curve.name in EC_ALGORITHMS
+    ):
+        return EC_ALGORITHMS[public_key.curve.name]
+    raise ImproperlyConfigured(f"Unsupported JWT signing key {type(public_key)}.")
+
+
+class SigningKey:
+    """
+    An asymmetric key identified by `kid`. Only keys with their private half
+    can sign; public keys alone still verify, and are published.
+    """
+
+    def __init__(self, kid, private_key=None, public_key=None):
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = public_key or private_key.public_key()
+        self.algorithm = get_algorithm(self.public_key)
+
+    @classmethod
+    def from_pem(cls, kid, data):
+        if b"PRIVATE KEY" in data:
+            return cls(kid, private_key=serialization.load_pem_private_key(data, None))
+        return cls(kid, public_key=serialization.load_pem_public_key(data))
+
+    def to_jwk(self):
+        jwk = jwt.get_algorithm_by_name(self.algorithm).to_jwk(
+            self.public_key, as_dict=True
+        )
+        jwk.update(kid=self.kid, alg=self.algorithm, use="sig")
+        return jwk
+
+
+class KeyRing:
+    """
+    The keys tokens are signed and verified with.
+
+    New tokens are signed with `signing_kid`, and carry it in their `kid`
+    header. Tokens are verified with the key their header names, so tokens
+    signed with a key that has since been rotated out keep working for as long
+    as that key stays in the ring.
+    """
+
+    def __init__(self, keys, signing_kid=None):
+        self.keys = {key.kid: key for key in keys}
+        private_kids = sorted(kid for kid, key in self.keys.items() if key.private_key)
+        if signing_kid is None and len(private_kids) == 1:
+            signing_kid = private_kids[0]
+        if self.keys and signing_kid not in private_kids:
+            raise ImproperlyConfigured(
+                "JWT_SIGNING_KEY_ID must name one of the private keys: "
+                f"{', '.join(private_kids) or 'none found'}."
+            )
+        self.signing_key = self.keys.get(signing_kid)
+
+    @classmethod
+    def from_directory(cls, path, signing_kid=None):
+        """
+        Loads `<kid>.pem` files, holding a private key or only a public one.
+        """
+        keys = []
+        for file in sorted(Path(path).glob("*.pem")):
+            keys.append(SigningKey.from_pem(file.stem, file.read_bytes()))
+        return cls(keys, signing_kid)
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def get(self, kid):
+        return self.keys.get(kid)
+
+    @cached_property
+    def jwks(self):
+        """
+        The JSON Web Key Set of the public keys, as bytes, and its ETag.
+        """
+        content = json.dumps(
+            {"keys": [key.to_jwk() for key in self.keys.values()]},
+            separators=(",", ":"),
+        ).encode()
+        return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+@functools.cache
+def load_keyring(path, signing_kid):
+    if not path:
+        return KeyRing([])
+    return KeyRing.from_directory(path, signing_kid)
+
+
+def get_keyring():
+    """
+    Returns the key ring of `JWT_SIGNING_KEYS_DIR`, empty when it is not set.
+    """
+    return load_keyring(settings.JWT_SIGNING_KEYS_DIR, settings.JWT_SIGNING_KEY_ID)
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Token backend signing with the key ring, so other services can verify
+    tokens with the keys published at `/.well-known/jwks.json`.
+
+    Without a key ring, tokens are signed with SIMPLE_JWT's `ALGORITHM` and
+    `SIGNING_KEY` as before. Tokens without a `kid` header are still checked
+    that way while `JWT_ACCEPT_LEGACY_TOKENS` is set, so tokens issued before
+    the switch stay valid until they expire.
+    """
+
+    def encode(self, payload):
+        keyring = get_keyring()
+        if not keyring:
+            return super().encode(payload)
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        key = keyring.signing_key
+        return jwt.encode(
+            jwt_payload,
+            key.private_key,
+            algorithm=key.algorithm,
+            headers={"kid": key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+        if kid is None:
+            if get_keyring() and not settings.JWT_ACCEPT_LEGACY_TOKENS:
+                raise TokenBackendError(_("Token is invalid or expired"))
+            return super().decode(token, verify)
+
+        key = get_keyring().get(kid)
+        if key is None:
+            raise TokenBackendError(_("Token is invalid or expired"))
+        try:
+            return jwt.decode(
+                token,
+                key.public_key,
+                # Only the algorithm of the named key, never one the token picks.
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+
+token_backend = KeyRingTokenBackend(
+    api_settings.ALGORITHM,
+    api_settings.SIGNING_KEY,
+    api_settings.VERIFYING_KEY,
+    api_settings.AUDIENCE,
+    api_settings.ISSUER,
+    api_settings.JWK_URL,
+    api_settings.LEEWAY,
+    api_settings.JSON_ENCODER,
+)
@@ -0,0 +1,72 @@
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from django.core.management.base import BaseCommand
+from django.utils.crypto import get_random_string
+
+from authentication.keys import SigningKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cost of signing and verifying an access token with HS256 "
+        "and with the asymmetric algorithms the key ring supports, using new "
+        "throwaway keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tokens",
+            type=int,
+            default=2000,
+            help="Tokens signed and verified per algorithm (default: 2000).",
+        )
+
+    def handle(self, *args, **options):
+        secret = get_random_string(50)
+        keys = [
+            SigningKey("rs256", rsa.generate_private_key(65537, 2048)),
+            SigningKey("es256", ec.generate_private_key(ec.SECP256R1())),
+            SigningKey("eddsa", ed25519.Ed25519PrivateKey.generate()),
+        ]
+        # The claims of an access token.
+        now = int(time.time())
+        payload = {
+            "token_type": "access",
+            "exp": now + 1800,
+            "iat": now,
+            "jti": get_random_string(32),
+            "user_id": 1,
+        }
+
+        self.stdout.write(
+            f"{'algorithm':>10} {'sign/s':>9} {'sign':>10} {'verify/s':>9} "
+            f"{'verify':>10} {'size':>6}"
+        )
+        self.report("HS256", options["tokens"], payload, secret, secret, {})
+        for key in keys:
+            self.report(
+                key.algorithm,
+                options["tokens"],
+                payload,
+                key.private_key,
+                key.public_key,
+                {"kid": key.kid},
+            )
+
+    def report(self, algorithm, count, payload, signing_key, verifying_key, headers):
+        start = time.perf_counter()
+        for _ in range(count):
+            token = jwt.encode(payload, signing_key, algorithm, headers=headers)
+        signing = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        for _ in range(count):
+            jwt.decode(token, verifying_key, algorithms=[algorithm])
+        verifying = (time.perf_counter() - start) / count
+
+        self.stdout.write(
+            f"{algorithm:>10} {1 / signing:>9.0f} {signing * 1e6:>7.1f} us "
+            f"{1 / verifying:>9.0f} {verifying * 1e6:>7.1f} us {len(token):>6}"
+        )
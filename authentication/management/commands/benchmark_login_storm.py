@@ -0,0 +1,190 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from authentication.tokens import RefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the read latency of running servers on their own and during a "
+        "storm of logins, e.g. a server hashing passwords on the request threads "
+        "(PASSWORD_HASHING_WORKERS=0) against one using the hashing pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            required=True,
+            help="Server base URL, optionally prefixed with a label (label=url). "
+            "Can be given several times.",
+        )
+        parser.add_argument("--email", required=True, help="User logging in.")
+        parser.add_argument("--password", required=True, help="The user's password.")
+        parser.add_argument(
+            "--read-path",
+            default="/api/products/",
+            help="Path read during the benchmark (default: /api/products/).",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10,
+            help="Seconds each phase lasts (default: 10).",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=4,
+            help="Read requests in flight at once (default: 4).",
+        )
+        parser.add_argument(
+            "--logins",
+            type=int,
+            default=50,
+            help="Login requests in flight at once during the storm (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options["email"], is_active=True).first()
+        if user is None:
+            raise CommandError(f"No active user {options['email']}.")
+        read_headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}",
+            "Accept": "application/json",
+        }
+        login_body = json.dumps(
+            {"email": options["email"], "password": options["password"]}
+        )
+
+        self.stdout.write(
+            f"{'url':>10} {'phase':>6} {'reads/s':>8} {'p50':>9} {'p95':>9} "
+            f"{'p99':>9} {'logins':>7} {'rejected':>8} {'errors':>7}"
+        )
+        for target in options["url"]:
+            label, separator, url = target.partition("=")
+            if not separator or "://" in label:
+                label, url = urlsplit(target).netloc, target
+            parts = urlsplit(url)
+            base_path = parts.path.rstrip("/")
+
+            status = self.request(
+                parts, "POST", f"{base_path}/api/user/login/", login_body
+            )
+            if status != 200:
+                raise CommandError(f"Logging in to {url} failed with status {status}.")
+
+            for phase, logins in (("idle", 0), ("storm", options["logins"])):
+                stop = threading.Event()
+                with ThreadPoolExecutor(
+                    max_workers=options["readers"] + logins
+                ) as pool:
+                    readers = [
+                        pool.submit(
+                            self.load,
+                            parts,
+                            "GET",
+                            f"{base_path}{options['read_path']}",
+                            None,
+                            read_headers,
+                            stop,
+                        )
+                        for _ in range(options["readers"])
+                    ]
+                    storm = [
+                        pool.submit(
+                            self.load,
+                            parts,
+                            "POST",
+                            f"{base_path}/api/user/login/",
+                            login_body,
+                            {"Content-Type": "application/json"},
+                            stop,
+                        )
+                        for _ in range(logins)
+                    ]
+                    time.sleep(options["duration"])
+                    stop.set()
+                    reads = self.combine(future.result() for future in readers)
+                    login_results = self.combine(future.result() for future in storm)
+
+                latencies = reads["latencies"]
+                if len(latencies) < 2:
+                    raise CommandError(f"Too few reads from {url} succeeded.")
+                quantiles = statistics.quantiles(latencies, n=100)
+                self.stdout.write(
+                    f"{label:>10} {phase:>6} "
+                    f"{len(latencies) / options['duration']:>8.1f} "
+                    f"{quantiles[49] * 1000:>6.1f} ms {quantiles[94] * 1000:>6.1f} ms "
+                    f"{quantiles[98] * 1000:>6.1f} ms "
+                    f"{len(login_results['latencies']):>7} "
+                    f"{login_results['rejected']:>8} "
+                    f"{reads['errors'] + login_results['errors']:>7}"
+                )
+
+    def get_connection(self, parts):
+        connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(parts.hostname, parts.port, timeout=60)
+
+    def request(self, parts, method, path, body, headers=None):
+        connection = self.get_connection(parts)
+        try:
+            connection.request(
+                method,
+                path,
+                body,
+                {"Content-Type": "application/json", **(headers or {})},
+            )
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def load(self, parts, method, path, body, headers, stop):
+        """
+        Sends requests over one keep-alive connection until `stop` is set, and
+        returns the latencies of the successful ones and the failure counts.
+        Requests turned away by the throttles or the hashing pool are counted
+        as rejected.
+        """
+        connection = self.get_connection(parts)
+        result = {"latencies": [], "rejected": 0, "errors": 0}
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                result["errors"] += 1
+                continue
+            if response.status == 200:
+                result["latencies"].append(time.perf_counter() - start)
+            elif response.status in (429, 503):
+                result["rejected"] += 1
+            else:
+                result["errors"] += 1
+        connection.close()
+        return result
+
+    def combine(self, results):
+        combined = {"latencies": [], "rejected": 0, "errors": 0}
+        for result in results:
+            combined["latencies"] += result["latencies"]
+            combined["rejected"] += result["rejected"]
+            combined["errors"] += result["errors"]
+        return combined
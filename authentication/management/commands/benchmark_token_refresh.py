@@ -0,0 +1,117 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from authentication.models import User
+from authentication.outstanding import outstanding_tokens
+from authentication.revocation import get_revocation_list
+from authentication.tokens import RefreshToken
+
+SERIALIZERS = {
+    "db": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "revocation": "authentication.serializers.TokenRefreshSerializer",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare token refreshes checked against the BlacklistedToken table with "
+        "refreshes checked against the revocation list, with a number of revoked "
+        "tokens in both. Everything written to the database is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Refreshes timed for each serializer (default: 2000).",
+        )
+        parser.add_argument(
+            "--revoked",
+            type=int,
+            default=10000,
+            help="Revoked tokens added beforehand (default: 10000).",
+        )
+        parser.add_argument(
+            "--email",
+            help="User the refresh token is issued for (default: the first admin).",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options["email"]:
+            user = users.filter(email=options["email"]).first()
+        else:
+            user = users.filter(is_admin=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No user to issue a refresh token for.")
+
+        self.stdout.write(
+            f"{'check':>10} {'req/s':>9} {'p50':>9} {'p99':>9} {'queries':>8}"
+        )
+        with transaction.atomic():
+            self.revoke_tokens(user, options["revoked"])
+            refresh = RefreshToken.for_user(user)
+            # Written now, so it is rolled back with the rest.
+            outstanding_tokens.flush_token(refresh["jti"])
+            refresh = str(refresh)
+            factory = APIRequestFactory()
+
+            for label, serializer in SERIALIZERS.items():
+                view = TokenRefreshView.as_view(_serializer_class=serializer)
+                # Warm up the caches.
+                view(factory.post("/", {"refresh": refresh}))
+                latencies = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options["requests"]):
+                        request = factory.post("/", {"refresh": refresh})
+                        start = time.perf_counter()
+                        response = view(request)
+                        latencies.append(time.perf_counter() - start)
+                        if response.status_code != 200:
+                            raise CommandError(
+                                f"Refresh failed with {response.status_code}."
+                            )
+
+                quantiles = statistics.quantiles(latencies, n=100)
+                self.stdout.write(
+                    f"{label:>10} {len(latencies) / sum(latencies):>9.1f} "
+                    f"{quantiles[49] * 1000:>6.2f} ms {quantiles[98] * 1000:>6.2f} ms "
+                    f"{len(queries) / len(latencies):>8.2f}"
+                )
+            transaction.set_rollback(True)
+
+    def revoke_tokens(self, user, count):
+        """
+        Adds `count` revoked tokens to the blacklist tables and to the
+        revocation list. The revocation list entries expire after 5 minutes.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(minutes=5)
+        outstanding = OutstandingToken.objects.bulk_create(
+            OutstandingToken(
+                user=user,
+                jti=uuid.uuid4().hex,
+                token="",
+                created_at=now,
+                expires_at=expires_at,
+            )
+            for _ in range(count)
+        )
+        BlacklistedToken.objects.bulk_create(
+            BlacklistedToken(token=token) for token in outstanding
+        )
+        revocation_list = get_revocation_list()
+        for token in outstanding:
+            revocation_list.revoke(token.jti, int(expires_at.timestamp()))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from authentication.revocation import get_revocation_list
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the blacklisted tokens that have not expired yet to the revocation "
+        "list. Run once when switching to it, or after the Redis data was lost."
+    )
+
+    def handle(self, *args, **options):
+        revocation_list = get_revocation_list()
+        tokens = (
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list("token__jti", "token__expires_at")
+            .iterator(chunk_size=2000)
+        )
+        count = 0
+        for jti, expires_at in tokens:
+            revocation_list.revoke(jti, int(expires_at.timestamp()))
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} revoked tokens loaded."))
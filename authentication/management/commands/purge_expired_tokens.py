@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.purge import (EXPIRY_INDEX_MISSING, has_expiry_index,
+                                  purge_expired_tokens, vacuum)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding tokens and their blacklist entries, in "
+        "batches, and optionally give the freed space back with VACUUM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Tokens deleted per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to wait between batches, so other writes get through "
+            "(default: 0.05).",
+        )
+        parser.add_argument(
+            "--vacuum",
+            choices=["full", "incremental"],
+            help="Run VACUUM, or PRAGMA incremental_vacuum, afterwards (SQLite).",
+        )
+
+    def handle(self, *args, **options):
+        if not has_expiry_index():
+            self.stdout.write(self.style.WARNING(EXPIRY_INDEX_MISSING))
+
+        started = time.monotonic()
+
+        def progress(deleted):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Deleted {deleted['outstanding']} tokens "
+                f"({deleted['outstanding'] / elapsed:.0f} rows/s)..."
+            )
+
+        deleted = purge_expired_tokens(
+            options["batch_size"], options["pause"], progress=progress
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Deleted {deleted['outstanding']} expired tokens and "
+                f"{deleted['blacklisted']} blacklist entries in {elapsed:.1f}s "
+                f"({deleted['outstanding'] / max(elapsed, 1e-9):.0f} rows/s)!"
+            )
+        )
+
+        if options["vacuum"]:
+            started = time.monotonic()
+            if vacuum(incremental=options["vacuum"] == "incremental"):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ Vacuumed in {time.monotonic() - started:.1f}s!"
+                    )
+                )
+            else:
+                self.stdout.write(
+                    self.style.WARNING("VACUUM is only run on SQLite, skipped.")
+                )
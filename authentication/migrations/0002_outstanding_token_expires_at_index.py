@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# Outstanding tokens are purged by expiry (authentication.purge). The model
+# belongs to simplejwt's token_blacklist app, so the index is created with SQL.
+# A token_blacklist migration that rebuilds the table drops it; migrating back
+# to 0001 and forward again re-creates it.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+        ("token_blacklist", "0012_alter_outstandingtoken_user"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS outstanding_token_expires_idx "
+            "ON token_blacklist_outstandingtoken (expires_at)",
+            reverse_sql="DROP INDEX IF EXISTS outstanding_token_expires_idx",
+        ),
+    ]
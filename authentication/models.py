@@ -1,6 +1,9 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.db import models
 
+from common.hashing import password_hashing
+
 
 #  Custom User Manager
 class UserManager(BaseUserManager):
@@ -58,6 +61,26 @@ class User(AbstractBaseUser):
     def __str__(self):
         return self.email
 
+    def set_password(self, raw_password):
+        "Hashes the password on the shared hashing pool."
+        self.password = password_hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        "Checks the password on the shared hashing pool, upgrading its hash if due."
+        is_correct, must_update = password_hashing.verify_password(
+            raw_password, self.password
+        )
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        "See check_password()."
+        return await sync_to_async(self.check_password)(raw_password)
+
     def has_perm(self, perm, obj=None):
         "Does the user have a specific permission?"
         # Simplest possible answer: Yes, always
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from common.background import PerProcess, start_daemon_thread
+from common.metrics import get_percentile
+
+logger = logging.getLogger(__name__)
+
+
+class OutstandingTokenBuffer:
+    """
+    Records issued refresh tokens in the background, so logins do not wait on
+    an `OutstandingToken` INSERT (on SQLite, the database write lock).
+
+    Tokens are kept in memory and written with one `bulk_create` every
+    `OUTSTANDING_TOKEN_FLUSH_INTERVAL` seconds, or as soon as
+    `OUTSTANDING_TOKEN_BATCH_SIZE` are waiting. A batch that fails is retried
+    with the next flush, up to `OUTSTANDING_TOKEN_MAX_RETRIES` times. When
+    `OUTSTANDING_TOKEN_MAX_BUFFER` tokens are already waiting, tokens are
+    written inline.
+    """
+
+    def __init__(self, samples=1000):
+        self.pending = {}
+        self.attempts = {}
+        self.condition = threading.Condition()
+        self.worker = PerProcess(
+            self.start_worker, is_alive=threading.Thread.is_alive, lock=self.condition
+        )
+        self.flush_times = deque(maxlen=samples)
+        self.max_depth = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def add(self, token):
+        """
+        Queues an unsaved `OutstandingToken` for writing.
+        """
+        self.ensure_worker()
+        with self.condition:
+            if len(self.pending) < settings.OUTSTANDING_TOKEN_MAX_BUFFER:
+                self.pending[token.jti] = token
+                self.max_depth = max(self.max_depth, len(self.pending))
+                if len(self.pending) >= settings.OUTSTANDING_TOKEN_BATCH_SIZE:
+                    self.condition.notify()
+                return
+        token.save()
+
+    def flush_token(self, jti):
+        """
+        Writes the token with the given JTI now, if it is still waiting. Used
+        before blacklisting a token, which needs its row.
+        """
+        with self.condition:
+            token = self.pending.pop(jti, None)
+            self.attempts.pop(jti, None)
+        if token is not None:
+            OutstandingToken.objects.bulk_create([token], ignore_conflicts=True)
+
+    def ensure_worker(self):
+        self.worker.get()
+
+    def start_worker(self, new_process):
+        if new_process:
+            self.pending = {}
+            self.attempts = {}
+        return start_daemon_thread(self.run, "outstanding-tokens")
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: len(self.pending) >= settings.OUTSTANDING_TOKEN_BATCH_SIZE,
+                    timeout=settings.OUTSTANDING_TOKEN_FLUSH_INTERVAL,
+                )
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Outstanding token flush failed")
+
+    def flush(self):
+        """
+        Writes every waiting token, and returns how many were written.
+        """
+        with self.condition:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            attempts, self.attempts = self.attempts, {}
+
+        start = time.perf_counter()
+        try:
+            OutstandingToken.objects.bulk_create(
+                batch.values(),
+                batch_size=settings.OUTSTANDING_TOKEN_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        except Exception:
+            logger.exception("Could not write %d outstanding tokens", len(batch))
+            self.retry(batch, attempts)
+            return 0
+        with self.condition:
+            self.flush_times.append(time.perf_counter() - start)
+            self.flushed += len(batch)
+        return len(batch)
+
+    def retry(self, batch, attempts):
+        with self.condition:
+            self.failed += 1
+            for jti, token in batch.items():
+                attempt = attempts.get(jti, 0) + 1
+                if attempt > settings.OUTSTANDING_TOKEN_MAX_RETRIES:
+                    logger.error("Giving up on outstanding token %s", jti)
+                    continue
+                if jti not in self.pending:
+                    self.pending[jti] = token
+                    self.attempts[jti] = attempt
+
+    def snapshot(self):
+        """
+        Returns the number of tokens waiting and written by this process, and
+        the median and 95th percentile of the recent flush times.
+        """
+        with self.condition:
+            flush_times = list(self.flush_times)
+            return {
+                "enabled": settings.OUTSTANDING_TOKEN_WRITE_BEHIND,
+                "depth": len(self.pending),
+                "max_depth": self.max_depth,
+                "flushed": self.flushed,
+                "failed_flushes": self.failed,
+                "flush_time_p50_ms": get_percentile(flush_times, 50),
+                "flush_time_p95_ms": get_percentile(flush_times, 95),
+            }
+
+
+outstanding_tokens = OutstandingTokenBuffer()
+# Write the waiting tokens when the process exits.
+atexit.register(outstanding_tokens.flush)
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from common.background import PerProcess, start_daemon_thread
+
+logger = logging.getLogger(__name__)
+
+PURGE_LOCK_KEY = "auth:token-purge"
+
+# Created by migration 0002 with SQL, as the table belongs to simplejwt.
+EXPIRY_INDEX = "outstanding_token_expires_idx"
+EXPIRY_INDEX_MISSING = (
+    f"Index {EXPIRY_INDEX} is missing, so each purge batch scans the whole "
+    "token table. Re-create it with `python manage.py migrate authentication "
+    "0001 && python manage.py migrate authentication`."
+)
+
+
+def has_expiry_index():
+    """
+    Returns whether the outstanding token table has its expires_at index. A
+    token_blacklist migration that rebuilds the table drops it.
+    """
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, OutstandingToken._meta.db_table
+        )
+    return EXPIRY_INDEX in constraints
+
+
+def purge_expired_tokens(batch_size=1000, pause=0.05, progress=None):
+    """
+    Deletes the outstanding tokens that have expired, and their blacklist
+    entries, `batch_size` at a time in oldest first order.
+
+    Each batch is its own short transaction, and the function sleeps `pause`
+    seconds between batches so other writers get the (SQLite) write lock.
+    Returns the number of outstanding and blacklisted tokens deleted.
+    """
+    now = timezone.now()
+    deleted = {"outstanding": 0, "blacklisted": 0}
+    while True:
+        with transaction.atomic():
+            # Walks the expires_at index.
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lt=now)
+                .order_by("expires_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Blacklist entries go with them (on_delete=CASCADE).
+            _, counts = OutstandingToken.objects.filter(id__in=ids).only("id").delete()
+        deleted["outstanding"] += counts.get("token_blacklist.OutstandingToken", 0)
+        deleted["blacklisted"] += counts.get("token_blacklist.BlacklistedToken", 0)
+        if progress is not None:
+            progress(deleted)
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+def vacuum(incremental=False):
+    """
+    Gives the space freed by deleted rows back to the file system, on SQLite.
+    `incremental` runs `PRAGMA incremental_vacuum`, which only works on
+    databases created with `auto_vacuum = INCREMENTAL` but does not rewrite the
+    whole file. Returns whether anything was run.
+    """
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        if incremental:
+            cursor.execute("PRAGMA incremental_vacuum")
+            cursor.fetchall()
+        else:
+            cursor.execute("VACUUM")
+    return True
+
+
+class TokenPurgeScheduler:
+    """
+    Purges expired tokens every `TOKEN_PURGE_INTERVAL` seconds from a
+    background thread of each server process. A cache lock makes sure only
+    one process purges per interval.
+    """
+
+    def __init__(self):
+        self.worker = PerProcess(self.start_worker, is_alive=threading.Thread.is_alive)
+
+    def ensure_worker(self, **kwargs):
+        if not settings.TOKEN_PURGE_INTERVAL:
+            return
+        self.worker.get()
+
+    def start_worker(self, new_process):
+        return start_daemon_thread(self.run, "token-purge")
+
+    def run(self):
+        while True:
+            time.sleep(settings.TOKEN_PURGE_INTERVAL)
+            try:
+                close_old_connections()
+                self.purge()
+            except Exception:
+                logger.exception("Expired token purge failed")
+            finally:
+                close_old_connections()
+
+    def purge(self):
+        if not cache.add(PURGE_LOCK_KEY, os.getpid(), settings.TOKEN_PURGE_INTERVAL):
+            return None
+        if not has_expiry_index():
+            logger.warning(EXPIRY_INDEX_MISSING)
+        start = time.monotonic()
+        deleted = purge_expired_tokens(
+            settings.TOKEN_PURGE_BATCH_SIZE, settings.TOKEN_PURGE_PAUSE
+        )
+        if settings.TOKEN_PURGE_VACUUM:
+            vacuum(incremental=settings.TOKEN_PURGE_VACUUM == "incremental")
+        logger.info(
+            "Purged %d expired tokens in %.1fs",
+            deleted["outstanding"],
+            time.monotonic() - start,
+        )
+        return deleted
+
+
+token_purger = TokenPurgeScheduler()
@@ -0,0 +1,207 @@
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from common.bloom import BloomFilter
+
+# Adds a JTI to the revoked set, scored by its expiry, and to the revocation
+# log under the next sequence number. Expired JTIs and old log entries go.
+REVOKE_SCRIPT = """
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+local seq = redis.call('INCR', KEYS[3])
+redis.call('ZADD', KEYS[2], seq, ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[4]) - 1)
+return seq
+"""
+
+# Returns the latest sequence number, whether every live JTI follows (rather
+# than only the ones revoked after ARGV[1]) and the JTIs. Every live JTI is
+# returned when asked to (ARGV[1] is -1) or when the log no longer reaches
+# back to ARGV[1].
+SYNC_SCRIPT = """
+local seq = tonumber(redis.call('GET', KEYS[3]) or '0')
+local last = tonumber(ARGV[1])
+local oldest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+local full = last < 0 or seq < last or (oldest[2] ~= nil and tonumber(oldest[2]) > last + 1)
+if full then
+    return {seq, 1, redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[2], '+inf')}
+end
+return {seq, 0, redis.call('ZRANGEBYSCORE', KEYS[2], '(' .. last, '+inf')}
+"""
+
+
+class RedisRevocationList:
+    """
+    Revoked token JTIs, kept in a Redis sorted set scored by token expiry, so
+    each JTI is dropped once its token would have expired anyway.
+
+    Each process keeps a Bloom filter of the revoked JTIs, so checking a token
+    that was never revoked, the common case, makes no network call. The
+    filter is brought up to date from the revocation log every
+    `TOKEN_REVOCATION_SYNC_INTERVAL` seconds, so a token revoked by another
+    process may be accepted here for up to that long. It is rebuilt from the
+    live JTIs once it is full or older than `TOKEN_REVOCATION_REBUILD_INTERVAL`.
+    Only JTIs the filter may contain are looked up in Redis.
+    """
+
+    revoked_key = "auth:revoked"
+    log_key = "auth:revoked:log"
+    seq_key = "auth:revoked:seq"
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self.bloom = None
+        self.seq = -1
+        self.synced_at = None
+        self.built_at = None
+        self.lock = threading.Lock()
+        self.scripts = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_client(self):
+        return self.cache.client.get_client(write=True)
+
+    def get_keys(self):
+        return [
+            self.cache.make_key(key)
+            for key in (self.revoked_key, self.log_key, self.seq_key)
+        ]
+
+    def run_script(self, script, args):
+        client = self.get_client()
+        if script not in self.scripts:
+            self.scripts[script] = client.register_script(script)
+        return self.scripts[script](keys=self.get_keys(), args=args, client=client)
+
+    def revoke(self, jti, exp):
+        self.run_script(
+            REVOKE_SCRIPT,
+            [jti, exp, int(time.time()), settings.TOKEN_REVOCATION_LOG_SIZE],
+        )
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self.bloom:
+            return False
+        score = self.get_client().zscore(self.get_keys()[0], jti)
+        return score is not None and score > time.time()
+
+    def get_revoked(self, jtis):
+        """
+        Returns which of the given JTIs are revoked, looking the ones the
+        Bloom filter may contain up with a single ZMSCORE.
+        """
+        self.sync()
+        candidates = [jti for jti in set(jtis) if jti in self.bloom]
+        if not candidates:
+            return set()
+        scores = self.get_client().zmscore(self.get_keys()[0], candidates)
+        now = time.time()
+        return {
+            jti
+            for jti, score in zip(candidates, scores)
+            if score is not None and score > now
+        }
+
+    def sync(self):
+        now = time.monotonic()
+        if (
+            self.synced_at is not None
+            and now - self.synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        ):
+            return
+        # One thread syncs, the others go on with the filter as it is.
+        if not self.lock.acquire(blocking=self.bloom is None):
+            return
+        try:
+            if self.synced_at is not None and (
+                now - self.synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL
+            ):
+                return
+            rebuild = (
+                self.bloom is None
+                or self.bloom.is_full
+                or now - self.built_at >= settings.TOKEN_REVOCATION_REBUILD_INTERVAL
+            )
+            seq, full, jtis = self.run_script(
+                SYNC_SCRIPT, [-1 if rebuild else self.seq, int(time.time())]
+            )
+            if full:
+                self.bloom = BloomFilter(
+                    max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, len(jtis) * 2)
+                )
+                self.built_at = now
+            for jti in jtis:
+                self.bloom.add(jti.decode())
+            self.seq = seq
+            self.synced_at = now
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        with self.lock:
+            self.bloom = None
+            self.seq = -1
+            self.synced_at = None
+
+
+class LocalRevocationList:
+    """
+    Revoked token JTIs kept in process memory. Meant for tests and single
+    process deployments.
+    """
+
+    def __init__(self):
+        self.revoked = {}
+        self.prune_at = 1000
+        self.lock = threading.Lock()
+
+    def revoke(self, jti, exp):
+        with self.lock:
+            self.revoked[jti] = exp
+            if len(self.revoked) >= self.prune_at:
+                # Expired JTIs go whenever the list has doubled.
+                now = time.time()
+                self.revoked = {
+                    key: expires
+                    for key, expires in self.revoked.items()
+                    if expires > now
+                }
+                self.prune_at = max(len(self.revoked) * 2, 1000)
+
+    def is_revoked(self, jti):
+        with self.lock:
+            return self.revoked.get(jti, 0) > time.time()
+
+    def get_revoked(self, jtis):
+        now = time.time()
+        with self.lock:
+            return {jti for jti in jtis if self.revoked.get(jti, 0) > now}
+
+    def clear(self):
+        with self.lock:
+            self.revoked = {}
+            self.prune_at = 1000
+
+
+@functools.cache
+def load_revocation_list(path):
+    return import_string(path)()
+
+
+def get_revocation_list():
+    """
+    Returns the `TOKEN_REVOCATION_BACKEND` instance.
+    """
+    return load_revocation_list(settings.TOKEN_REVOCATION_BACKEND)
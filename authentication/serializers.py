@@ -4,9 +4,18 @@ from django.utils.encoding import (DjangoUnicodeDecodeError, force_bytes,
                                    smart_str)
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 TokenBackendError)
+from rest_framework_simplejwt.settings import api_settings
 
+from authentication.cache import get_password_digest, user_cache
+from authentication.keys import token_backend
 from authentication.models import User
+from authentication.revocation import get_revocation_list
+from authentication.tokens import RefreshToken
 from common.email import Util
+from common.fieldsets import DynamicFieldsMixin
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -71,7 +80,7 @@ class UserLoginSerializer(serializers.ModelSerializer):
         fields = ["email", "password"]
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for retrieving user profile details.
 
@@ -223,3 +232,137 @@ class UserPasswordResetSerializer(serializers.Serializer):
         except DjangoUnicodeDecodeError as identifier:
             PasswordResetTokenGenerator().check_token(user, token)
             raise serializers.ValidationError("Token is not Valid or Expired")
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Serializer for refreshing an access token.
+
+    Checks the refresh token against the revocation list and loads the user
+    through the user cache, so a refresh usually makes no database query.
+    """
+
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM, None)
+        if user_id:
+            try:
+                user = user_cache.get(user_id)
+            except User.DoesNotExist:
+                user = None
+            if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(
+                    self.error_messages["no_active_account"],
+                    "no_active_account",
+                )
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data["refresh"] = str(refresh)
+
+        return data
+
+
+class TokenIntrospectionSerializer(serializers.Serializer):
+    """
+    Serializer for checking a batch of access and refresh tokens at once.
+
+    Signatures and expiry are checked token by token. Revoked refresh tokens
+    and users are then looked up for the whole batch: one revocation list
+    lookup, and one user cache `get_many` (MGET, then one query for the users
+    not cached).
+
+    Fields:
+        - tokens (list): Up to `TOKEN_INTROSPECTION_MAX_TOKENS` tokens.
+    """
+
+    tokens = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+    def validate_tokens(self, value):
+        if len(value) > settings.TOKEN_INTROSPECTION_MAX_TOKENS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than "
+                f"{settings.TOKEN_INTROSPECTION_MAX_TOKENS} elements."
+            )
+        return value
+
+    def introspect(self):
+        """
+        Returns the status of each token, in order: `active` with the token's
+        type and claims, or not `active` with the reason.
+        """
+        payloads = [self.decode(token) for token in self.validated_data["tokens"]]
+        valid = [payload for payload in payloads if payload is not None]
+        revoked = get_revocation_list().get_revoked(
+            payload[api_settings.JTI_CLAIM]
+            for payload in valid
+            if payload[api_settings.TOKEN_TYPE_CLAIM] == "refresh"
+        )
+        users = user_cache.get_many(
+            [
+                payload[api_settings.USER_ID_CLAIM]
+                for payload in valid
+                if api_settings.USER_ID_CLAIM in payload
+            ]
+        )
+
+        results = []
+        for payload in payloads:
+            error = self.get_error(payload, revoked, users)
+            if error:
+                results.append({"active": False, "error": error})
+            else:
+                results.append(
+                    {
+                        "active": True,
+                        "token_type": payload[api_settings.TOKEN_TYPE_CLAIM],
+                        "claims": payload,
+                    }
+                )
+        return results
+
+    def decode(self, token):
+        """
+        Returns the claims of a valid access or refresh token, otherwise None.
+        """
+        try:
+            payload = token_backend.decode(token)
+        except TokenBackendError:
+            return None
+        if (
+            payload.get(api_settings.TOKEN_TYPE_CLAIM) not in ("access", "refresh")
+            or api_settings.JTI_CLAIM not in payload
+            or "exp" not in payload
+        ):
+            return None
+        return payload
+
+    def get_error(self, payload, revoked, users):
+        """
+        Returns why the token is not active, or None if it is.
+        """
+        if payload is None:
+            return "Token is invalid or expired"
+        if payload[api_settings.JTI_CLAIM] in revoked:
+            return "Token is blacklisted"
+        user = users.get(payload.get(api_settings.USER_ID_CLAIM))
+        if user is None:
+            return "User not found"
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            return "User is inactive"
+        if api_settings.CHECK_REVOKE_TOKEN and payload.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_password_digest(user):
+            return "Token revoked by password change"
+        return None
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import user_cache
+from .models import User
+
+
+def evict_user(user):
+    """
+    Evicts the user from the user cache now, and again once the transaction
+    commits, so a request reading the old row meanwhile cannot cache it again.
+    """
+    user_id = getattr(user, api_settings.USER_ID_FIELD)
+    user_cache.evict(user_id)
+    transaction.on_commit(lambda: user_cache.evict(user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """
+    Evicts a user from the user cache whenever it is saved, e.g. when its
+    password changes or it is deactivated.
+    """
+    evict_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """
+    Evicts a user from the user cache when it is deleted.
+    """
+    evict_user(instance)
@@ -1,3 +1,964 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import SkipTest, mock
 
-# Create your tests here.
+import jwt
+from asgiref.sync import async_to_sync
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from redis import Redis, RedisError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.cache import user_cache
+from authentication.models import User
+from authentication.outstanding import outstanding_tokens
+from authentication.purge import has_expiry_index, purge_expired_tokens
+from authentication.revocation import RedisRevocationList, get_revocation_list
+from authentication.views import get_tokens_for_user
+from common.async_cache import AsyncCache
+from common.background import PerProcess
+from common.bloom import BloomFilter
+from common.email import email_queue
+from common.hashing import password_hashing
+from common.throttling import RedisTokenBucket, get_backend, take_token
+from products.models import Product
+
+# Runs without Redis, writing tokens on the request thread.
+TEST_SETTINGS = {
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    "THROTTLE_BACKEND": "common.throttling.LocalTokenBucket",
+    "TOKEN_REVOCATION_BACKEND": "authentication.revocation.LocalRevocationList",
+    "OUTSTANDING_TOKEN_WRITE_BEHIND": False,
+    "TOKEN_PURGE_INTERVAL": None,
+}
+
+
+class TestEmailBackend(locmem.EmailBackend):
+    """
+    locmem backend that counts connections, can hold sends until released and
+    can fail a number of sends.
+    """
+
+    connections = 0
+    attempts = 0
+    failures = 0
+    started = None
+    release = None
+
+    def open(self):
+        if not getattr(self, "is_open", False):
+            self.is_open = True
+            type(self).connections += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        cls = type(self)
+        if cls.release is not None:
+            cls.started.set()
+            cls.release.wait(5)
+        cls.attempts += 1
+        if cls.failures:
+            cls.failures -= 1
+            raise ConnectionError("SMTP is down")
+        return super().send_messages(messages)
+
+
+class PerProcessTests(TestCase):
+    def test_created_once_per_process(self):
+        created = []
+        alive = {}
+
+        def create(new_process):
+            created.append(new_process)
+            alive[len(created)] = True
+            return len(created)
+
+        worker = PerProcess(create, is_alive=lambda value: alive[value])
+
+        self.assertEqual(worker.get(), 1)
+        self.assertEqual(worker.get(), 1)
+        alive[1] = False
+        self.assertEqual(worker.get(), 2)
+        # A forked child finds the parent's object and creates its own.
+        with mock.patch("common.background.os.getpid", return_value=os.getpid() + 1):
+            self.assertFalse(worker.started())
+            self.assertEqual(worker.get(), 3)
+            self.assertTrue(worker.started())
+        self.assertEqual(created, [True, False, True])
+
+
+@override_settings(
+    **TEST_SETTINGS,
+    EMAIL_BACKEND="authentication.tests.TestEmailBackend",
+    EMAIL_QUEUE_RETRY_DELAY=0,
+    EMAIL_QUEUE_MAX_RETRIES=2,
+)
+class EmailQueueTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+        TestEmailBackend.connections = 0
+        TestEmailBackend.attempts = 0
+        TestEmailBackend.failures = 0
+        TestEmailBackend.started = threading.Event()
+        TestEmailBackend.release = None
+
+    def tearDown(self):
+        if TestEmailBackend.release is not None:
+            TestEmailBackend.release.set()
+        email_queue.wait(5)
+
+    def enqueue(self, count):
+        for i in range(count):
+            email_queue.enqueue(EmailMessage(f"Message {i}", "Body", to=["a@a.com"]))
+
+    def test_reset_email_is_sent_in_the_background(self):
+        User.objects.create_user("jane@example.com", "Jane", True, "password")
+        TestEmailBackend.release = threading.Event()
+
+        response = APIClient().post(
+            "/api/send-reset-password-email/", {"email": "jane@example.com"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        # The response did not wait for the email.
+        self.assertEqual(len(mail.outbox), 0)
+        TestEmailBackend.release.set()
+        self.assertTrue(email_queue.wait(5))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["jane@example.com"])
+        self.assertIn("/api/user/reset-password/", mail.outbox[0].body)
+
+    def test_queued_messages_share_a_connection(self):
+        TestEmailBackend.release = threading.Event()
+        self.enqueue(1)
+        # The worker is held on the first message while the next ones queue up.
+        TestEmailBackend.started.wait(5)
+        self.enqueue(5)
+        TestEmailBackend.release.set()
+
+        self.assertTrue(email_queue.wait(5))
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(TestEmailBackend.connections, 2)
+
+    def test_failed_messages_are_retried(self):
+        TestEmailBackend.failures = 2
+
+        with self.assertLogs("common.email", "ERROR"):
+            self.enqueue(1)
+            self.assertTrue(email_queue.wait(5))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(TestEmailBackend.attempts, 3)
+
+    @override_settings(EMAIL_QUEUE_RETRY_DELAY=60)
+    def test_retries_do_not_hold_up_other_messages(self):
+        TestEmailBackend.failures = 1
+
+        with self.assertLogs("common.email", "ERROR"):
+            self.enqueue(1)
+            self.assertFalse(email_queue.wait(0.2))
+            self.enqueue(1)
+            self.assertFalse(email_queue.wait(0.2))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(email_queue.retries), 1)
+        # Makes the retry due, and wakes the worker up with another message.
+        email_queue.retries[0] = (0, *email_queue.retries[0][1:])
+        self.enqueue(1)
+        self.assertTrue(email_queue.wait(5))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_messages_are_given_up_on_after_max_retries(self):
+        TestEmailBackend.failures = 10
+
+        with self.assertLogs("common.email", "ERROR") as logs:
+            self.enqueue(1)
+            self.assertTrue(email_queue.wait(5))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(TestEmailBackend.attempts, 3)
+        self.assertIn("Giving up on email", logs.output[-1])
+
+
+@override_settings(**TEST_SETTINGS)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+        User.objects.create_user("jane@example.com", "Jane", True, "password")
+
+    def login(self, password="password"):
+        return APIClient().post(
+            "/api/user/login/", {"email": "jane@example.com", "password": password}
+        )
+
+    def test_login_checks_password_on_the_pool(self):
+        completed = password_hashing.completed
+
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(password_hashing.completed, completed + 2)
+
+    @override_settings(PASSWORD_HASHING_RETRY_AFTER=3)
+    def test_login_is_turned_away_when_the_pool_is_full(self):
+        password_hashing.ensure_pool()
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+
+        with mock.patch.object(password_hashing, "slots", full):
+            response = self.login()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(PASSWORD_HASHING_TIMEOUT=0.01)
+    def test_login_is_turned_away_when_hashing_stalls(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def stall(password, encoded):
+            started.set()
+            release.wait(5)
+            return False, False
+
+        timed_out = password_hashing.timed_out
+        with mock.patch("django.contrib.auth.hashers.verify_password", stall):
+            response = self.login()
+            self.assertTrue(started.wait(5))
+        release.set()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(password_hashing.timed_out, timed_out + 1)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_passwords_can_be_hashed_on_the_request_thread(self):
+        user = User.objects.get()
+        user.set_password("new password")
+
+        self.assertTrue(user.check_password("new password"))
+        self.assertFalse(user.check_password("password"))
+
+
+@override_settings(
+    **TEST_SETTINGS,
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"login": "3/min", "login_email": "2/min"},
+    },
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+
+    def login(self, email="jane@example.com", ip="10.0.0.1", **extra):
+        return APIClient().post(
+            "/api/user/login/",
+            {"email": email, "password": "password"},
+            REMOTE_ADDR=ip,
+            **extra,
+        )
+
+    def test_logins_are_limited_per_email(self):
+        self.assertEqual(self.login(ip="10.0.0.1").status_code, 401)
+        self.assertEqual(self.login(ip="10.0.0.2").status_code, 401)
+
+        response = self.login(ip="10.0.0.3")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(self.login("JOHN@example.com", "10.0.0.3").status_code, 401)
+
+    def test_logins_are_limited_per_ip(self):
+        for email in ("a@example.com", "b@example.com", "c@example.com"):
+            self.assertEqual(self.login(email).status_code, 401)
+
+        self.assertEqual(self.login("d@example.com").status_code, 429)
+        self.assertEqual(self.login("d@example.com", "10.0.0.2").status_code, 401)
+
+    def test_forwarded_for_headers_are_not_trusted(self):
+        for i, email in enumerate(("a@example.com", "b@example.com", "c@example.com")):
+            response = self.login(email, HTTP_X_FORWARDED_FOR=f"203.0.113.{i}")
+            self.assertEqual(response.status_code, 401)
+
+        response = self.login("d@example.com", HTTP_X_FORWARDED_FOR="203.0.113.9")
+
+        self.assertEqual(response.status_code, 429)
+
+    def test_requests_are_let_through_when_redis_fails(self):
+        bucket = RedisTokenBucket()
+        # Nothing listens on port 1.
+        client = Redis(port=1, socket_connect_timeout=0.1)
+
+        with mock.patch.object(bucket, "get_client", return_value=client):
+            with self.assertLogs("common.throttling", "WARNING"):
+                self.assertEqual(bucket.consume("login:1", 3, 60), (True, 0))
+
+    def test_bucket_refills_over_the_period(self):
+        # 2 tokens per minute, one token back every 30 seconds.
+        self.assertEqual(take_token(0, 0, 15, 2, 2 / 60), (False, 15, 0.5))
+        self.assertEqual(take_token(0, 0, 30, 2, 2 / 60), (True, 0, 0))
+        self.assertEqual(take_token(0, 0, 600, 2, 2 / 60), (True, 0, 1))
+
+
+@override_settings(**TEST_SETTINGS)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user("jane@example.com", "Jane", True, "pw")
+        self.product = Product.objects.create(name="Lamp", description="", price=10)
+        # Drops the eviction marker of the new user.
+        cache.clear()
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = APIClient(headers=self.headers)
+
+    def get_user_queries(self, queries):
+        return [query for query in queries if "authentication_user" in query["sql"]]
+
+    def test_authenticated_reads_make_no_user_query(self):
+        self.client.get(f"/api/products/{self.product.pk}/")
+
+        with CaptureQueriesContext(connection) as queries:
+            for path in (f"/api/products/{self.product.pk}/", "/api/products/"):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+        self.assertEqual(self.get_user_queries(queries), [])
+
+    def test_async_reads_make_no_user_query(self):
+        get = async_to_sync(AsyncClient().get)
+        path = f"/api/products/async/{self.product.pk}/"
+        get(path, headers=self.headers)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = get(path, headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_user_queries(queries), [])
+
+    def test_users_are_shared_across_processes_through_the_cache(self):
+        self.client.get("/api/user/profile/")
+        user_cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/user/profile/").status_code, 200)
+
+        self.assertEqual(self.get_user_queries(queries), [])
+
+    def test_saved_users_are_evicted(self):
+        self.client.get("/api/user/profile/")
+        self.user.name = "Jane Doe"
+        self.user.save()
+
+        response = self.client.get("/api/user/profile/")
+
+        self.assertEqual(response.json()["data"]["name"], "Jane Doe")
+
+    def test_deactivated_users_are_rejected(self):
+        self.client.get("/api/user/profile/")
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get("/api/user/profile/").status_code, 401)
+
+    def test_changed_passwords_revoke_tokens(self):
+        with mock.patch.object(jwt_settings, "CHECK_REVOKE_TOKEN", True):
+            token = RefreshToken.for_user(self.user).access_token
+            client = APIClient(headers={"Authorization": f"Bearer {token}"})
+            self.assertEqual(client.get("/api/user/profile/").status_code, 200)
+            self.user.set_password("new password")
+            self.user.save()
+
+            self.assertEqual(client.get("/api/user/profile/").status_code, 401)
+
+    def deactivate_while_filling(self):
+        """
+        Patches the user cache so the user is deactivated between the reader's
+        query and its fill.
+        """
+        to_entry = user_cache.to_entry
+
+        def deactivate_then_fill(user):
+            self.user.is_active = False
+            self.user.save()
+            return to_entry(user)
+
+        return mock.patch.object(
+            user_cache, "to_entry", side_effect=deactivate_then_fill
+        )
+
+    def test_fill_after_a_miss_does_not_overwrite_an_eviction(self):
+        with self.deactivate_while_filling():
+            self.assertEqual(self.client.get("/api/user/profile/").status_code, 200)
+
+        self.assertEqual(self.client.get("/api/user/profile/").status_code, 401)
+
+    def test_batch_fill_does_not_overwrite_an_eviction(self):
+        with self.deactivate_while_filling():
+            users = user_cache.get_many([self.user.pk])
+        self.assertTrue(users[self.user.pk].is_active)
+        user_cache.clear()
+
+        self.assertFalse(user_cache.get(self.user.pk).is_active)
+
+    def test_password_hashes_are_not_cached(self):
+        user_cache.get(self.user.pk)
+
+        entry = cache.get(user_cache.get_key(self.user.pk))
+
+        self.assertNotIn(self.user.password, repr(entry))
+        user = user_cache.get(self.user.pk)
+        # The hash is loaded from the database when it is read.
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, self.user.password)
+
+    def test_cached_users_can_change_their_password(self):
+        self.client.get("/api/user/profile/")
+
+        response = self.client.post(
+            "/api/user/changepassword/",
+            {"password": "new password", "confirm_password": "new password"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new password"))
+        self.assertEqual(self.user.name, "Jane")
+
+    def test_callers_get_their_own_copy(self):
+        user = user_cache.get(self.user.pk)
+        user.name = "Changed"
+
+        self.assertEqual(user_cache.get(self.user.pk).name, "Jane")
+
+
+@override_settings(**TEST_SETTINGS)
+class UserProfileTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("jane@example.com", "Jane", True, "pw")
+        self.client = APIClient(
+            headers={"Authorization": f"Bearer {get_tokens_for_user(user)['access']}"}
+        )
+
+    def get_profile(self, **params):
+        return self.client.get("/api/user/profile/", params)
+
+    def test_fields(self):
+        self.assertEqual(
+            self.get_profile(fields="name,email").json()["data"],
+            {"email": "jane@example.com", "name": "Jane"},
+        )
+        self.assertEqual(
+            list(self.get_profile(exclude="tc").json()["data"]), ["id", "email", "name"]
+        )
+
+    def test_unknown_fields(self):
+        response = self.get_profile(fields="name,password")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"], {"fields": "Unknown fields: password."}
+        )
+
+
+@override_settings(**TEST_SETTINGS)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        get_backend().clear()
+        get_revocation_list().clear()
+        User.objects.create_user("jane@example.com", "Jane", True, "password")
+        response = APIClient().post(
+            "/api/user/login/", {"email": "jane@example.com", "password": "password"}
+        )
+        self.tokens = response.json()["data"]["token"]
+        # Drops the eviction marker the login's last_login update left.
+        cache.clear()
+        self.client = APIClient(
+            headers={"Authorization": f"Bearer {self.tokens['access']}"}
+        )
+
+    def refresh(self):
+        return self.client.post(
+            "/api/user/token/refresh/", {"refresh": self.tokens["refresh"]}
+        )
+
+    def test_refresh_makes_no_query(self):
+        self.refresh()
+
+        with self.assertNumQueries(0):
+            response = self.refresh()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+
+    def test_logged_out_tokens_cannot_be_refreshed(self):
+        response = self.client.post(
+            "/api/user/logout/", {"refresh": self.tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.refresh()
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+
+    def test_deactivated_users_cannot_refresh(self):
+        User.objects.update(is_active=False)
+        user_cache.clear()
+
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"revoked-{i}")
+
+        self.assertTrue(all(f"revoked-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"valid-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertTrue(bloom.is_full)
+
+
+# The Redis revocation list runs against the server at REDIS_URL, and its
+# tests are skipped when there is none.
+@override_settings(
+    **{
+        **TEST_SETTINGS,
+        "CACHES": {
+            "default": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": settings.REDIS_URL,
+                "KEY_PREFIX": "test",
+            }
+        },
+        "TOKEN_REVOCATION_SYNC_INTERVAL": 60,
+        "TOKEN_REVOCATION_REBUILD_INTERVAL": 3600,
+    }
+)
+class RedisRevocationListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1).ping()
+        except RedisError:
+            raise SkipTest(f"No Redis server at {settings.REDIS_URL}")
+        super().setUpClass()
+
+    def setUp(self):
+        # Two processes sharing the server.
+        self.first = RedisRevocationList()
+        self.second = RedisRevocationList()
+        self.client = self.first.get_client()
+        self.keys = self.first.get_keys()
+        self.client.delete(*self.keys)
+        self.exp = int(time.time()) + 3600
+
+    def elapse(self, revocation_list, seconds):
+        revocation_list.synced_at -= seconds
+        revocation_list.built_at -= seconds
+
+    def test_revocations_are_seen_after_one_sync_interval(self):
+        self.assertFalse(self.second.is_revoked("revoked"))
+        bloom = self.second.bloom
+
+        self.first.revoke("revoked", self.exp)
+
+        self.assertTrue(self.first.is_revoked("revoked"))
+        self.assertFalse(self.second.is_revoked("revoked"))
+        self.elapse(self.second, 60)
+        self.assertTrue(self.second.is_revoked("revoked"))
+        # Only the log was read, into the same filter.
+        self.assertIs(self.second.bloom, bloom)
+
+    @override_settings(TOKEN_REVOCATION_LOG_SIZE=2)
+    def test_lagging_processes_resync_in_full(self):
+        self.assertFalse(self.second.is_revoked("revoked-0"))
+        bloom = self.second.bloom
+
+        for i in range(5):
+            self.first.revoke(f"revoked-{i}", self.exp)
+
+        self.assertEqual(self.client.zcard(self.keys[1]), 2)
+        self.assertEqual(self.client.zcard(self.keys[0]), 5)
+        self.elapse(self.second, 60)
+        self.assertEqual(
+            self.second.get_revoked(f"revoked-{i}" for i in range(5)),
+            {f"revoked-{i}" for i in range(5)},
+        )
+        self.assertIsNot(self.second.bloom, bloom)
+        self.assertEqual(self.second.seq, 5)
+
+    def test_filter_is_rebuilt_without_expired_jtis(self):
+        self.first.revoke("revoked", self.exp)
+        self.assertTrue(self.second.is_revoked("revoked"))
+        self.client.zadd(self.keys[0], {"revoked": time.time() - 1})
+        bloom = self.second.bloom
+
+        self.elapse(self.second, 60)
+        self.assertFalse(self.second.is_revoked("revoked"))
+        self.assertIs(self.second.bloom, bloom)
+        self.assertIn("revoked", self.second.bloom)
+
+        self.elapse(self.second, 3600)
+        self.assertFalse(self.second.is_revoked("revoked"))
+        self.assertIsNot(self.second.bloom, bloom)
+        self.assertNotIn("revoked", self.second.bloom)
+
+    def test_revoking_drops_expired_jtis(self):
+        self.client.zadd(self.keys[0], {"expired": time.time() - 1})
+
+        self.first.revoke("revoked", self.exp)
+
+        self.assertEqual(self.client.zrange(self.keys[0], 0, -1), [b"revoked"])
+        self.assertEqual(self.first.get_revoked(["revoked", "expired"]), {"revoked"})
+
+
+@override_settings(
+    CACHES={
+        **TEST_SETTINGS["CACHES"],
+        "redis": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": settings.REDIS_URL,
+        },
+    }
+)
+class AsyncCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1).ping()
+        except RedisError:
+            raise SkipTest(f"No Redis server at {settings.REDIS_URL}")
+        super().setUpClass()
+
+    def test_client_is_closed_with_its_loop(self):
+        redis_cache = AsyncCache("redis")
+
+        async def use():
+            await redis_cache.set("async-cache-test", 1, timeout=10)
+            self.assertEqual(await redis_cache.get("async-cache-test"), 1)
+            return redis_cache.get_client()
+
+        # Each call from sync code runs on a new loop, with its own client.
+        first = async_to_sync(use)()
+        second = async_to_sync(use)()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(redis_cache.clients), 0)
+        for client in (first, second):
+            pool = client.connection_pool
+            self.assertFalse(
+                any(
+                    connection.is_connected
+                    for connection in (
+                        *pool._available_connections,
+                        *pool._in_use_connections,
+                    )
+                )
+            )
+
+
+# Tokens are only written when the tests flush them.
+@override_settings(
+    **{
+        **TEST_SETTINGS,
+        "OUTSTANDING_TOKEN_WRITE_BEHIND": True,
+        "OUTSTANDING_TOKEN_FLUSH_INTERVAL": 3600,
+        "OUTSTANDING_TOKEN_BATCH_SIZE": 1000,
+    }
+)
+class OutstandingTokenBufferTests(TestCase):
+    def setUp(self):
+        get_backend().clear()
+        get_revocation_list().clear()
+        User.objects.create_user("jane@example.com", "Jane", True, "password")
+
+    def tearDown(self):
+        outstanding_tokens.flush()
+
+    def login(self):
+        response = APIClient().post(
+            "/api/user/login/", {"email": "jane@example.com", "password": "password"}
+        )
+        return response.json()["data"]["token"]
+
+    def test_tokens_are_written_in_batches(self):
+        self.login()
+        self.login()
+
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertEqual(outstanding_tokens.snapshot()["depth"], 2)
+        self.assertEqual(outstanding_tokens.flush(), 2)
+        self.assertEqual(
+            OutstandingToken.objects.filter(user__email="jane@example.com").count(), 2
+        )
+        self.assertEqual(outstanding_tokens.snapshot()["depth"], 0)
+
+    def test_unwritten_tokens_can_be_blacklisted(self):
+        tokens = self.login()
+        client = APIClient(headers={"Authorization": f"Bearer {tokens['access']}"})
+
+        response = client.post("/api/user/logout/", {"refresh": tokens["refresh"]})
+
+        self.assertEqual(response.status_code, 200)
+        token = OutstandingToken.objects.get()
+        self.assertEqual(token.token, tokens["refresh"])
+        self.assertTrue(BlacklistedToken.objects.filter(token=token).exists())
+        self.assertEqual(outstanding_tokens.flush(), 0)
+        response = client.post(
+            "/api/user/token/refresh/", {"refresh": tokens["refresh"]}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(**TEST_SETTINGS)
+class TokenPurgeTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("jane@example.com", "Jane", True, "password")
+        now = timezone.now()
+        for i, expires_at in enumerate(
+            [now - timedelta(days=2), now - timedelta(days=1), now - timedelta(hours=1)]
+            + [now + timedelta(hours=1), now + timedelta(days=1)]
+        ):
+            token = OutstandingToken.objects.create(
+                user=user, jti=f"jti-{i}", token="", expires_at=expires_at
+            )
+            if i % 2 == 0:
+                BlacklistedToken.objects.create(token=token)
+
+    def test_expired_tokens_are_purged_in_batches(self):
+        batches = []
+
+        deleted = purge_expired_tokens(batch_size=2, pause=0, progress=batches.append)
+
+        self.assertEqual(deleted, {"outstanding": 3, "blacklisted": 2})
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list("jti", flat=True)),
+            {"jti-3", "jti-4"},
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_purge_uses_the_expiry_index(self):
+        queryset = (
+            OutstandingToken.objects.filter(expires_at__lt=timezone.now())
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:1000]
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+
+        self.assertTrue(
+            any("outstanding_token_expires_idx" in step for step in plan), plan
+        )
+
+    def test_command_reports_rows_per_second(self):
+        out = StringIO()
+
+        call_command("purge_expired_tokens", "--pause", "0", stdout=out)
+
+        self.assertIn(
+            "Deleted 3 expired tokens and 2 blacklist entries", out.getvalue()
+        )
+        self.assertIn("rows/s", out.getvalue())
+
+    def test_command_warns_without_the_expiry_index(self):
+        self.assertTrue(has_expiry_index())
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX outstanding_token_expires_idx")
+        out = StringIO()
+
+        call_command("purge_expired_tokens", "--pause", "0", stdout=out)
+
+        self.assertIn("outstanding_token_expires_idx is missing", out.getvalue())
+        self.assertIn("Deleted 3 expired tokens", out.getvalue())
+
+
+@override_settings(**TEST_SETTINGS)
+class SigningKeyTests(TestCase):
+    def setUp(self):
+        self.keys_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.keys_dir.cleanup)
+        for kid, key in (
+            ("2026-01", rsa.generate_private_key(65537, 2048)),
+            ("2026-02", ed25519.Ed25519PrivateKey.generate()),
+        ):
+            pem = key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+            Path(self.keys_dir.name, f"{kid}.pem").write_bytes(pem)
+        self.user = User.objects.create_user("jane@example.com", "Jane", True, "pw")
+
+    def use_key(self, kid, **kwargs):
+        return override_settings(
+            JWT_SIGNING_KEYS_DIR=self.keys_dir.name, JWT_SIGNING_KEY_ID=kid, **kwargs
+        )
+
+    def test_jwks_publishes_public_keys(self):
+        with self.use_key("2026-01"):
+            response = self.client.get("/.well-known/jwks.json")
+            etag = response["ETag"]
+            revalidated = self.client.get(
+                "/.well-known/jwks.json", headers={"If-None-Match": etag}
+            )
+
+        keys = {key["kid"]: key for key in json.loads(response.content)["keys"]}
+        self.assertEqual(keys["2026-01"]["alg"], "RS256")
+        self.assertEqual(keys["2026-02"]["alg"], "EdDSA")
+        self.assertNotIn("d", keys["2026-01"])
+        self.assertNotIn("d", keys["2026-02"])
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn(f"max-age={settings.JWKS_MAX_AGE}", response["Cache-Control"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_tokens_verify_with_the_published_keys(self):
+        with self.use_key("2026-02"):
+            jwks = json.loads(self.client.get("/.well-known/jwks.json").content)
+            access = str(get_tokens_for_user(self.user)["access"])
+            response = self.client.get(
+                "/api/user/profile/", headers={"Authorization": f"Bearer {access}"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        key = jwt.PyJWKSet.from_dict(jwks)[jwt.get_unverified_header(access)["kid"]]
+        payload = jwt.decode(access, key.key, algorithms=[key.algorithm_name])
+        self.assertEqual(payload["user_id"], self.user.id)
+
+    def test_tokens_signed_with_rotated_keys_stay_valid(self):
+        with self.use_key("2026-01"):
+            old = get_tokens_for_user(self.user)["refresh"]
+        with self.use_key("2026-02"):
+            response = self.client.post("/api/user/token/refresh/", {"refresh": old})
+            new = response.json()["access"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(jwt.get_unverified_header(new)["kid"], "2026-02")
+
+    def test_unknown_and_legacy_tokens(self):
+        legacy = str(RefreshToken.for_user(self.user))
+        with self.use_key("2026-01"):
+            unknown = jwt.encode(
+                jwt.decode(legacy, options={"verify_signature": False}),
+                settings.SECRET_KEY,
+                headers={"kid": "2025-12"},
+            )
+            self.assertEqual(self.refresh(unknown), 401)
+            self.assertEqual(self.refresh(legacy), 200)
+        with self.use_key("2026-01", JWT_ACCEPT_LEGACY_TOKENS=False):
+            self.assertEqual(self.refresh(legacy), 401)
+
+    def refresh(self, token):
+        return self.client.post(
+            "/api/user/token/refresh/", {"refresh": token}
+        ).status_code
+
+
+@override_settings(**TEST_SETTINGS)
+class TokenIntrospectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        get_revocation_list().clear()
+        self.admin = User.objects.create_superuser(
+            "admin@example.com", "Admin", True, "pw"
+        )
+        self.jane = User.objects.create_user("jane@example.com", "Jane", True, "pw")
+        self.joe = User.objects.create_user("joe@example.com", "Joe", True, "pw")
+        self.client = APIClient(
+            headers={
+                "Authorization": f"Bearer {get_tokens_for_user(self.admin)['access']}"
+            }
+        )
+
+    def introspect(self, tokens):
+        return self.client.post(
+            "/api/user/token/introspect/", {"tokens": tokens}, format="json"
+        )
+
+    def test_tokens_are_checked_in_one_batch(self):
+        jane = get_tokens_for_user(self.jane)
+        revoked = get_tokens_for_user(self.jane)["refresh"]
+        payload = jwt.decode(revoked, options={"verify_signature": False})
+        get_revocation_list().revoke(payload["jti"], payload["exp"])
+        joe = get_tokens_for_user(self.joe)["access"]
+        self.joe.is_active = False
+        self.joe.save()
+        # Drops the eviction markers of the writes above.
+        cache.clear()
+        self.introspect(["not-a-token"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.introspect(
+                [jane["access"], jane["refresh"], revoked, joe, jane["access"] + "x"]
+            )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["data"]["tokens"]
+        self.assertEqual(
+            [result["active"] for result in results], [True, True] + [False] * 3
+        )
+        self.assertEqual(results[0]["token_type"], "access")
+        self.assertEqual(results[1]["claims"]["user_id"], self.jane.id)
+        self.assertEqual(
+            [result["error"] for result in results[2:]],
+            ["Token is blacklisted", "User is inactive", "Token is invalid or expired"],
+        )
+        user_queries = [q for q in queries if "authentication_user" in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertFalse(any("token_blacklist" in q["sql"] for q in queries))
+
+    def test_tokens_of_changed_passwords_and_deleted_users(self):
+        with mock.patch.object(jwt_settings, "CHECK_REVOKE_TOKEN", True):
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}"
+            )
+            jane = get_tokens_for_user(self.jane)["access"]
+            joe = get_tokens_for_user(self.joe)["access"]
+            self.jane.set_password("new password")
+            self.jane.save()
+            self.joe.delete()
+
+            response = self.introspect([jane, joe])
+
+        self.assertEqual(
+            [result["error"] for result in response.json()["data"]["tokens"]],
+            ["Token revoked by password change", "User not found"],
+        )
+
+    @override_settings(TOKEN_INTROSPECTION_MAX_TOKENS=2)
+    def test_batches_are_limited(self):
+        self.assertEqual(self.introspect(["a", "b", "c"]).status_code, 400)
+
+    def test_requires_an_admin(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.jane)['access']}"
+        )
+
+        self.assertEqual(self.introspect(["a"]).status_code, 403)
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .keys import token_backend
+from .outstanding import outstanding_tokens
+from .revocation import get_revocation_list
+
+
+class KeyRingTokenMixin:
+    """
+    Signs and verifies tokens with the key ring (see `authentication.keys`).
+    """
+
+    def get_token_backend(self):
+        return token_backend
+
+
+class AccessToken(KeyRingTokenMixin, tokens.AccessToken):
+    pass
+
+
+class RefreshToken(KeyRingTokenMixin, tokens.RefreshToken):
+    """
+    Refresh token checked against the revocation list (see
+    `authentication.revocation`) instead of the `BlacklistedToken` table.
+
+    Blacklisting still records the token in the database, and also adds it to
+    the revocation list. With `OUTSTANDING_TOKEN_WRITE_BEHIND`, new tokens are
+    recorded in the background by `outstanding_tokens`.
+    """
+
+    access_token_class = AccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        if not settings.OUTSTANDING_TOKEN_WRITE_BEHIND:
+            return super().for_user(user)
+
+        # Token.for_user(), without BlacklistMixin's INSERT.
+        token = super(tokens.BlacklistMixin, cls).for_user(user)
+        outstanding_tokens.add(
+            OutstandingToken(
+                user=user,
+                jti=token[api_settings.JTI_CLAIM],
+                token=str(token),
+                created_at=token.current_time,
+                expires_at=datetime_from_epoch(token["exp"]),
+            )
+        )
+        return token
+
+    def check_blacklist(self):
+        if get_revocation_list().is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        # The token may not have been written yet.
+        outstanding_tokens.flush_token(self.payload[api_settings.JTI_CLAIM])
+        blacklisted = super().blacklist()
+        get_revocation_list().revoke(
+            self.payload[api_settings.JTI_CLAIM], self.payload["exp"]
+        )
+        return blacklisted
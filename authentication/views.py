@@ -1,18 +1,26 @@
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
 from rest_framework import status
 from rest_framework.decorators import api_view
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from authentication.keys import get_keyring
 from authentication.serializers import (SendPasswordResetEmailSerializer,
+                                        TokenIntrospectionSerializer,
                                         UserChangePasswordSerializer,
                                         UserLoginSerializer,
                                         UserPasswordResetSerializer,
                                         UserProfileSerializer,
                                         UserRegistrationSerializer)
-from common.renderers import UserRenderer
+from authentication.tokens import RefreshToken
+from common.fieldsets import get_requested_fields
 from common.response import error_response, success_response
+from common.throttling import EmailRateThrottle, IPRateThrottle
 
 
 @api_view(["GET"])
@@ -23,6 +31,24 @@ def check_server(request):
     return success_response(message="Server is working!")
 
 
+@require_GET
+def jwks(request):
+    """
+    Publishes the public keys tokens are signed with, as a JSON Web Key Set,
+    so other services can verify tokens themselves.
+
+    The response is built once per key ring, and may be cached by clients and
+    proxies for `JWKS_MAX_AGE` seconds, then revalidated with its ETag.
+    """
+    content, etag = get_keyring().jwks
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=settings.JWKS_MAX_AGE)
+    return response
+
+
 def get_tokens_for_user(user):
     """
     Generates JWT tokens for an authenticated user.
@@ -34,6 +60,29 @@ def get_tokens_for_user(user):
     }
 
 
+class TokenIntrospectionView(APIView):
+    """
+    Checks a batch of access and refresh tokens for services that cannot
+    verify tokens themselves, returning each token's status and claims.
+    Requires authentication and admin privileges.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        serializer = TokenIntrospectionSerializer(data=request.data)
+        if serializer.is_valid():
+            return success_response(
+                message="Tokens introspected successfully",
+                data={"tokens": serializer.introspect()},
+            )
+        return error_response(
+            message="Token introspection failed",
+            errors=serializer.errors,
+            code=status.HTTP_400_BAD_REQUEST,
+        )
+
+
 class UserRegistrationView(APIView):
     """
     Handles user registration by accepting user details,
@@ -42,7 +91,8 @@ class UserRegistrationView(APIView):
     if registration is successful.
     """
 
-    renderer_classes = [UserRenderer]
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "register"
 
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
@@ -68,7 +118,8 @@ class UserLoginView(APIView):
     Returns an error response if credentials are invalid.
     """
 
-    renderer_classes = [UserRenderer]
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "login"
 
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
@@ -101,14 +152,21 @@ class UserLoginView(APIView):
 class UserProfileView(APIView):
     """
     Retrieves and returns the authenticated user's profile details.
-    Requires authentication.
+    Requires authentication. Limit the fields with `?fields=` or `?exclude=`.
     """
 
-    renderer_classes = [UserRenderer]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserProfileSerializer(request.user)
+        try:
+            fields = get_requested_fields(request, UserProfileSerializer.Meta.fields)
+        except ValidationError as e:
+            return error_response(
+                message="Error fetching user profile",
+                errors=e.detail,
+                code=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = UserProfileSerializer(request.user, fields=fields)
         return success_response(
             message="User profile fetched successfully",
             data=serializer.data,
@@ -123,7 +181,6 @@ class UserChangePasswordView(APIView):
     Returns success response if password is changed successfully.
     """
 
-    renderer_classes = [UserRenderer]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -148,7 +205,8 @@ class SendPasswordResetEmailView(APIView):
     Requires an email input and returns success response if email is sent.
     """
 
-    renderer_classes = [UserRenderer]
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "password_reset"
 
     def post(self, request, format=None):
         serializer = SendPasswordResetEmailSerializer(data=request.data)
@@ -165,8 +223,6 @@ class UserPasswordResetView(APIView):
     Requires new password input and returns success response if reset is successful.
     """
 
-    renderer_classes = [UserRenderer]
-
     def post(self, request, uid, token, format=None):
         serializer = UserPasswordResetSerializer(
             data=request.data, context={"uid": uid, "token": token}
@@ -185,7 +241,6 @@ class UserLogoutView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
-    renderer_classes = [UserRenderer]
 
     def post(self, request, format=None):
         refresh_token = request.data.get("refresh")
@@ -0,0 +1,151 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+# INCRBY that fails on a missing key, like django-redis' incr().
+INCR_EXISTING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class AsyncCache:
+    """
+    Non-blocking access to a Django cache from async code.
+
+    On a django-redis cache it talks to Redis with `redis.asyncio`, using the
+    cache's own key function and value encoding, so both sides share every
+    entry. Django's built-in async methods are thread pool wrappers around the
+    sync client, so they are only used for the other backends (e.g. locmem in
+    tests).
+
+    Redis connections belong to an event loop, so one client is kept per loop
+    and closed when the loop shuts down.
+    """
+
+    def __init__(self, alias=DEFAULT_CACHE_ALIAS):
+        self.alias = alias
+        self.clients = weakref.WeakKeyDictionary()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_client(self):
+        """
+        Returns the `redis.asyncio` client of the running loop, or None when the
+        cache is not a django-redis cache.
+        """
+        config = settings.CACHES[self.alias]
+        if aioredis is None or not config["BACKEND"].startswith("django_redis."):
+            return None
+
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            location = config["LOCATION"]
+            if not isinstance(location, str):
+                location = location[0]
+            client = self.clients[loop] = aioredis.Redis.from_url(location)
+            # asyncio.run() and async_to_sync() cancel the tasks left when
+            # their loop completes, a new loop being made for each call from
+            # sync code.
+            loop.create_task(self.close_on_shutdown(loop, client))
+        return client
+
+    async def close_on_shutdown(self, loop, client):
+        """
+        Waits until the loop cancels it, then closes the loop's client.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            self.clients.pop(loop, None)
+            await client.aclose()
+
+    def make_key(self, key, version=None):
+        return self.cache.client.make_key(key, version=version)
+
+    def get_timeout_ms(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.cache.default_timeout
+        return None if timeout is None else int(timeout * 1000)
+
+    async def get(self, key, default=None, version=None):
+        client = self.get_client()
+        if client is None:
+            return await self.cache.aget(key, default, version=version)
+        value = await client.get(self.make_key(key, version))
+        return default if value is None else self.cache.client.decode(value)
+
+    async def get_many(self, keys, version=None):
+        client = self.get_client()
+        if client is None:
+            return await self.cache.aget_many(keys, version=version)
+        if not keys:
+            return {}
+        keys = list(keys)
+        values = await client.mget([self.make_key(key, version) for key in keys])
+        return {
+            key: self.cache.client.decode(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    async def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        await self.set_many({key: value}, timeout, version)
+
+    async def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        client = self.get_client()
+        if client is None:
+            await self.cache.aset_many(data, timeout, version=version)
+            return
+        timeout_ms = self.get_timeout_ms(timeout)
+        async with client.pipeline(transaction=False) as pipe:
+            for key, value in data.items():
+                key = self.make_key(key, version)
+                if timeout_ms is not None and timeout_ms <= 0:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, self.cache.client.encode(value), px=timeout_ms)
+            await pipe.execute()
+
+    async def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        client = self.get_client()
+        if client is None:
+            return await self.cache.aadd(key, value, timeout, version=version)
+        timeout_ms = self.get_timeout_ms(timeout)
+        if timeout_ms is not None and timeout_ms <= 0:
+            return False
+        return bool(
+            await client.set(
+                self.make_key(key, version),
+                self.cache.client.encode(value),
+                px=timeout_ms,
+                nx=True,
+            )
+        )
+
+    async def incr(self, key, delta=1, version=None):
+        client = self.get_client()
+        if client is None:
+            return await self.cache.aincr(key, delta, version=version)
+        value = await client.eval(
+            INCR_EXISTING_SCRIPT, 1, self.make_key(key, version), delta
+        )
+        if value is None:
+            raise ValueError(f"Key '{key}' not found.")
+        return value
+
+
+async_cache = AsyncCache()
@@ -0,0 +1,127 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.generics import GenericAPIView
+from rest_framework.views import APIView
+
+from common.renderers import JSONRenderer
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines (`async def get(...)`), so Django
+    serves it natively under ASGI.
+
+    - Authentication awaits `aauthenticate()` on authenticators that have it
+      (see `authentication.backends.AsyncJWTAuthentication`); the others run in
+      a thread.
+    - Permissions await `ahas_permission()` when they define it and call
+      `has_permission()` otherwise, which must then not touch the database.
+    - Throttles, if any, run in a thread.
+    - Responses are rendered inside the view and handed to Django as plain
+      `HttpResponse`s, since Django renders template responses of async views
+      in a thread. That is why only the JSON renderer is enabled.
+    """
+
+    renderer_classes = [JSONRenderer]
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.get_plain_response(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Async version of `initial()`.
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        await self.acheck_permissions(request)
+        if self.get_throttles():
+            await sync_to_async(self.check_throttles)(request)
+
+    async def aperform_authentication(self, request):
+        """
+        Authenticates the request up front, so `request.user` never triggers a
+        sync authentication later on.
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                        request
+                    )
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            if hasattr(permission, "ahas_permission"):
+                allowed = await permission.ahas_permission(request, self)
+            else:
+                allowed = permission.has_permission(request, self)
+            if not allowed:
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
+
+    def get_plain_response(self, response):
+        """
+        Renders a DRF response into a plain `HttpResponse`.
+        """
+        if not hasattr(response, "render"):
+            return response
+        response.render()
+        plain = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            plain[header] = value
+        return plain
+
+
+class AsyncGenericAPIView(AsyncAPIView, GenericAPIView):
+    """
+    GenericAPIView with async handlers. Querysets must be evaluated with the
+    async ORM (`aget`, `acount`, `async for`).
+    """
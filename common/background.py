@@ -0,0 +1,49 @@
+import os
+import threading
+
+
+class PerProcess:
+    """
+    Holds an object that owns threads, like a worker thread or a thread pool,
+    created lazily once per process.
+
+    A forked worker process does not inherit the parent's threads, so `get()`
+    creates the object again on first use in each process. `create(new_process)`
+    is called under `lock`, with `new_process` false only when an object of the
+    current process is replaced because `is_alive` reported it dead; state
+    copied from the parent process should be reset when it is true.
+    """
+
+    def __init__(self, create, is_alive=None, lock=None):
+        self.create = create
+        self.is_alive = is_alive
+        self.lock = threading.Lock() if lock is None else lock
+        self.value = None
+        self.pid = None
+
+    def get(self):
+        if self.current():
+            return self.value
+        with self.lock:
+            if not self.current():
+                self.value = self.create(new_process=self.pid != os.getpid())
+                self.pid = os.getpid()
+            return self.value
+
+    def started(self):
+        """
+        Returns whether the object was created in this process.
+        """
+        return self.pid == os.getpid()
+
+    def current(self):
+        return self.started() and (self.is_alive is None or self.is_alive(self.value))
+
+
+def start_daemon_thread(target, name):
+    """
+    Starts `target` on a daemon thread, which does not keep the process alive.
+    """
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,27 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """
+    Returns a 304 response when the request's `If-None-Match`/`If-Modified-Since`
+    headers match the given validators, otherwise None.
+
+    `etag` is a quoted entity tag and `last_modified` a POSIX timestamp.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """
+    Adds `ETag`/`Last-Modified` headers and asks clients to revalidate with them.
+    """
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
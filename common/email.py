@@ -1,29 +1,181 @@
+import atexit
+import heapq
+import itertools
+import logging
 import os
+import queue
+import threading
+import time
 
-from django.core.mail import EmailMultiAlternatives
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 
+from .background import PerProcess, start_daemon_thread
+
+logger = logging.getLogger(__name__)
+
+
+class EmailQueue:
+    """
+    Sends emails from a background thread, so requests do not wait on SMTP.
+
+    The worker takes up to `EMAIL_QUEUE_BATCH_SIZE` queued messages at a time
+    and sends them over a single connection. A message that fails is retried
+    up to `EMAIL_QUEUE_MAX_RETRIES` times, waiting `EMAIL_QUEUE_RETRY_DELAY`
+    seconds before the first retry and twice as long before each next one.
+    Messages waiting to be retried are held with the time they are due, so the
+    worker goes on sending the others in the meantime.
+    When the queue is full (`EMAIL_QUEUE_MAX_SIZE`), messages are sent inline.
+    """
+
+    def __init__(self):
+        self.queue = None
+        # (due, tiebreaker, message, attempts), only used by the worker thread.
+        self.retries = []
+        self.counter = itertools.count()
+        self.worker = PerProcess(self.start_worker, is_alive=threading.Thread.is_alive)
+
+    def enqueue(self, message):
+        self.ensure_worker()
+        try:
+            self.queue.put_nowait((message, 0))
+        except queue.Full:
+            message.send()
+
+    def ensure_worker(self):
+        self.worker.get()
+
+    def start_worker(self, new_process):
+        if new_process:
+            self.queue = queue.Queue(maxsize=settings.EMAIL_QUEUE_MAX_SIZE)
+            self.retries = []
+        return start_daemon_thread(self.run, "email-queue")
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every queued message has been sent or given up on, or
+        until `timeout` seconds have passed. Returns whether the queue drained.
+        """
+        if not self.worker.started():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def run(self):
+        while True:
+            batch = self.get_batch()
+            try:
+                retries = self.send_batch(batch)
+            except Exception:
+                logger.exception("Email queue worker failed")
+                retries = []
+            # Messages to be retried stay unfinished until they are sent or
+            # given up on.
+            for _ in range(len(batch) - len(retries)):
+                self.queue.task_done()
+            now = time.monotonic()
+            for message, attempts in retries:
+                due = now + settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+                heapq.heappush(
+                    self.retries, (due, next(self.counter), message, attempts)
+                )
+
+    def get_batch(self):
+        """
+        Returns the retries that are due and the queued messages, up to
+        `EMAIL_QUEUE_BATCH_SIZE`, waiting until there is at least one.
+        """
+        while True:
+            now = time.monotonic()
+            batch = []
+            while (
+                self.retries
+                and self.retries[0][0] <= now
+                and len(batch) < settings.EMAIL_QUEUE_BATCH_SIZE
+            ):
+                _, _, message, attempts = heapq.heappop(self.retries)
+                batch.append((message, attempts))
+            if not batch:
+                timeout = self.retries[0][0] - now if self.retries else None
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    continue
+            while len(batch) < settings.EMAIL_QUEUE_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            return batch
+
+    def send_batch(self, batch):
+        """
+        Sends a batch over one connection. Returns the messages that failed and
+        are to be retried, with their attempt counts.
+        """
+        failed = []
+        connection = get_connection()
+        try:
+            for index, (message, attempts) in enumerate(batch):
+                try:
+                    # Connects for the first message and again after a failure.
+                    connection.open()
+                except Exception:
+                    logger.exception("Could not connect to the email server")
+                    for item in batch[index:]:
+                        failed += self.get_retry(*item)
+                    break
+                try:
+                    connection.send_messages([message])
+                except Exception:
+                    logger.exception("Could not send email to %s", message.to)
+                    connection.close()
+                    failed += self.get_retry(message, attempts)
+        finally:
+            connection.close()
+        return failed
+
+    def get_retry(self, message, attempts):
+        if attempts >= settings.EMAIL_QUEUE_MAX_RETRIES:
+            logger.error("Giving up on email to %s", message.to)
+            return []
+        return [(message, attempts + 1)]
+
+
+email_queue = EmailQueue()
+# Give the queue a chance to drain when the process exits.
+atexit.register(email_queue.wait, timeout=30)
+
 
 class Util:
     """
     Utility class for handling email-related operations.
     """
 
+    @staticmethod
+    def send_email(data):
+        """
+        Builds the password reset email and queues it for sending.
+        """
+        subject = data["subject"]
+        to_email = data["to_email"]
+        context = data["context"]
 
-@staticmethod
-def send_email(data):
-    subject = data["subject"]
-    to_email = data["to_email"]
-    context = data["context"]
-
-    html_message = render_to_string("reset_password_email.html", context)
-    text_message = f"Click the link to reset your password: {context['reset_link']}"
+        html_message = render_to_string("reset_password_email.html", context)
+        text_message = f"Click the link to reset your password: {context['reset_link']}"
 
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=text_message,
-        from_email=os.getenv("EMAIL_FROM"),
-        to=[to_email],
-    )
-    email.attach_alternative(html_message, "text/html")
-    email.send()
+        email = EmailMultiAlternatives(
+            subject=subject,
+            body=text_message,
+            from_email=os.getenv("EMAIL_FROM"),
+            to=[to_email],
+        )
+        email.attach_alternative(html_message, "text/html")
+        email_queue.enqueue(email)
@@ -0,0 +1,42 @@
+from rest_framework.exceptions import ValidationError
+
+
+def get_requested_fields(request, available):
+    """
+    Returns the fields selected with `?fields=a,b` and `?exclude=c`, keeping the
+    order of `available`. Every field is selected when neither is given.
+    """
+    selected = list(available)
+
+    for param in ("fields", "exclude"):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names.difference(available)
+        if unknown:
+            raise ValidationError(
+                {param: f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+
+        if param == "fields":
+            selected = [name for name in selected if name in names]
+        else:
+            selected = [name for name in selected if name not in names]
+
+    if not selected:
+        raise ValidationError({"fields": "Select at least one field."})
+    return selected
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin taking a `fields` argument that limits the output to those fields.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
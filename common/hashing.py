@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .background import PerProcess
+
+
+class HashingUnavailable(APIException):
+    """
+    Raised when too many password hashes are already queued. Answered with a
+    503 and a Retry-After header.
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many login attempts in progress, try again shortly."
+    default_code = "hashing_unavailable"
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF's exception handler turns `wait` into a Retry-After header.
+        self.wait = wait
+
+
+class PasswordHashingService:
+    """
+    Hashes and checks passwords on a bounded pool of worker threads, so a burst
+    of logins cannot take every request thread with it.
+
+    PBKDF2 releases the GIL, so `PASSWORD_HASHING_WORKERS` threads hash on as
+    many cores while the other request threads keep serving. At most
+    `PASSWORD_HASHING_QUEUE_SIZE` more hashes wait for a worker; past that,
+    `HashingUnavailable` is raised straight away rather than piling up work.
+    It is also raised when a hash has not finished after
+    `PASSWORD_HASHING_TIMEOUT` seconds, so a stalled pool does not hold the
+    request thread. With no workers, passwords are hashed on the calling
+    thread as usual.
+    """
+
+    def __init__(self, samples=1000):
+        self.executor = None
+        self.slots = None
+        self.pool = PerProcess(self.start_pool)
+        self.stats_lock = threading.Lock()
+        self.queue_times = deque(maxlen=samples)
+        self.hash_times = deque(maxlen=samples)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def make_password(self, password):
+        if password is None:
+            # Unusable passwords are not hashed.
+            return hashers.make_password(None)
+        return self.run(hashers.make_password, password)
+
+    def verify_password(self, password, encoded):
+        """
+        Returns whether `password` matches `encoded`, and whether the hash
+        should be upgraded to the preferred hasher.
+        """
+        if password is None or not hashers.is_password_usable(encoded):
+            return False, False
+        return self.run(hashers.verify_password, password, encoded)
+
+    def run(self, function, *args):
+        if not settings.PASSWORD_HASHING_WORKERS:
+            return self.timed(function, args, time.perf_counter())
+        self.ensure_pool()
+        if not self.slots.acquire(blocking=False):
+            with self.stats_lock:
+                self.rejected += 1
+            raise HashingUnavailable(wait=settings.PASSWORD_HASHING_RETRY_AFTER)
+        try:
+            future = self.executor.submit(
+                self.timed, function, args, time.perf_counter()
+            )
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+        except FutureTimeoutError:
+            # A hash still waiting for a worker is dropped, one already
+            # running finishes and frees its slot then.
+            future.cancel()
+            with self.stats_lock:
+                self.timed_out += 1
+            raise HashingUnavailable(wait=settings.PASSWORD_HASHING_RETRY_AFTER)
+
+    def timed(self, function, args, queued_at):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            finished = time.perf_counter()
+            with self.stats_lock:
+                self.queue_times.append(started - queued_at)
+                self.hash_times.append(finished - started)
+                self.completed += 1
+
+    def ensure_pool(self):
+        self.pool.get()
+
+    def start_pool(self, new_process):
+        workers = settings.PASSWORD_HASHING_WORKERS
+        self.slots = threading.BoundedSemaphore(
+            workers + settings.PASSWORD_HASHING_QUEUE_SIZE
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        return self.executor
+
+    def snapshot(self):
+        """
+        Returns the number of hashes done, turned away and timed out by this
+        process, and the median and 95th percentile of the recent queue and
+        hash times.
+        """
+        # Imported here, common.metrics needs DRF, which needs the User model.
+        from common.metrics import get_percentile
+
+        with self.stats_lock:
+            queue_times = list(self.queue_times)
+            hash_times = list(self.hash_times)
+            data = {
+                "workers": settings.PASSWORD_HASHING_WORKERS,
+                "queue_size": settings.PASSWORD_HASHING_QUEUE_SIZE,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+        for name, times in (("queue_time", queue_times), ("hash_time", hash_times)):
+            data[f"{name}_p50_ms"] = get_percentile(times, 50)
+            data[f"{name}_p95_ms"] = get_percentile(times, 95)
+        return data
+
+
+password_hashing = PasswordHashingService()
@@ -0,0 +1,43 @@
+import statistics
+
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+
+from common.response import success_response
+
+_providers = {}
+
+
+def register(name, provider):
+    """
+    Registers a callable returning a dict of metrics, published under `name`.
+    """
+    _providers[name] = provider
+
+
+def collect():
+    """
+    Returns the current value of every registered metric.
+    """
+    return {name: provider() for name, provider in sorted(_providers.items())}
+
+
+def get_percentile(times, percentile):
+    """
+    Returns a percentile of durations in seconds, in milliseconds.
+    """
+    if len(times) < 2:
+        return round(times[0] * 1000, 2) if times else None
+    return round(statistics.quantiles(times, n=100)[percentile - 1] * 1000, 2)
+
+
+class MetricsView(APIView):
+    """
+    Returns the runtime metrics registered by the apps, such as cache hit ratios.
+    Requires authentication and admin privileges.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return success_response(message="Metrics fetched successfully", data=collect())
@@ -0,0 +1,176 @@
+import zlib
+
+import brotli
+import zstandard
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+# Supported encodings, most preferred first, with their default level.
+ENCODINGS = {
+    "zstd": (ZstdCompressor, 3),
+    "br": (BrotliCompressor, 4),
+    "gzip": (GzipCompressor, 6),
+}
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+re_accepted_encoding = _lazy_re_compile(
+    r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$"
+)
+
+
+def parse_accept_encoding(header):
+    """
+    Returns the `{encoding: quality}` of an `Accept-Encoding` header.
+    """
+    qualities = {}
+    for item in header.lower().split(","):
+        match = re_accepted_encoding.match(item)
+        if match is None:
+            continue
+        name, quality = match.groups()
+        try:
+            qualities[name] = 1.0 if quality is None else float(quality)
+        except ValueError:
+            continue
+    return qualities
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses with the encoding the client accepts with the highest
+    quality, zstd first, then brotli, then gzip when several are as good.
+
+    - Responses under `COMPRESSION_MIN_SIZE` bytes (default 1024), like the JSON
+      envelopes of the auth endpoints, are sent as they are. Streaming responses
+      are compressed chunk by chunk, whatever their size.
+    - Levels come from `COMPRESSION_LEVELS`, e.g. `{"gzip": 6, "br": 4, "zstd": 3}`.
+    - Responses that already have a `Content-Encoding` (such as `?gzip=true`
+      exports) or whose content type is not text, JSON or XML are left alone.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+        levels = getattr(settings, "COMPRESSION_LEVELS", {})
+        self.encodings = {
+            name: (compressor_class, levels.get(name, level))
+            for name, (compressor_class, level) in ENCODINGS.items()
+        }
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = self.select_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+        compressor_class, level = self.encodings[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(
+                    response.streaming_content, compressor_class(level)
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    response.streaming_content, compressor_class(level)
+                )
+            del response["Content-Length"]
+        else:
+            compressor = compressor_class(level)
+            content = compressor.compress(response.content) + compressor.flush()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        # The compressed bytes differ from the ones a strong ETag was computed
+        # for, so it becomes weak, like Django's GZipMiddleware does.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = f"W/{etag}"
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header("Content-Encoding"):
+            return False
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        return response.streaming or len(response.content) >= self.min_size
+
+    def select_encoding(self, header):
+        """
+        Returns the encoding to use, or None to send the response as it is.
+        """
+        qualities = parse_accept_encoding(header)
+        selected, selected_quality = None, 0
+        for name in self.encodings:
+            quality = qualities.get(name, qualities.get("*", 0))
+            if quality > selected_quality:
+                selected, selected_quality = name, quality
+        # A client that prefers uncompressed responses gets them.
+        if qualities.get("identity", 0) > selected_quality:
+            return None
+        return selected
+
+    @staticmethod
+    def compress_stream(chunks, compressor):
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    async def compress_async_stream(chunks, compressor):
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
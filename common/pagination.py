@@ -1,4 +1,19 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Max, Min, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from common.async_cache import async_cache
 
 
 class Pagination(PageNumberPagination):
@@ -9,3 +24,402 @@ class Pagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class CountingPaginator(DjangoPaginator):
+    """
+    Django paginator that gets the total count from a callable instead of
+    running `count()` on the object list itself.
+    """
+
+    def __init__(self, object_list, per_page, count_resolver, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_resolver = count_resolver
+
+    @cached_property
+    def count(self):
+        return self.count_resolver(self.object_list)
+
+
+class CachedCountPagination(Pagination):
+    """
+    Page number pagination that avoids a `COUNT(*)` on every request.
+
+    - The total is kept in the cache under the key returned by the view's
+      `get_count_cache_key()`, so the view decides how it is invalidated and may
+      keep it up to date incrementally.
+    - Counting stops at `count_limit` rows. Past it, `count` is an estimate,
+      see `estimate_count()`, never less than the limit or the end of the
+      requested page. The response then holds `count_is_estimate: true`, and
+      the estimate is cached under `<key>:estimate` so the next requests skip
+      the count.
+    - `?count=false` leaves the count out. Only the rows up to the end of the
+      requested page are looked at, just enough to know if there is a next page.
+    """
+
+    count_query_param = "count"
+    count_cache_timeout = 60 * 15
+    count_limit = 10_000
+    # Primary keys sampled by estimate_count(), in that many evenly spaced windows.
+    count_sample_size = 2_000
+    count_sample_windows = 20
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.setup(request)
+        if self.include_count and hasattr(view, "get_count_cache_key"):
+            self.count_cache_key = view.get_count_cache_key()
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of `paginate_queryset()`, counting and fetching the page
+        with the async ORM. The view provides `aget_count_cache_key()`.
+        """
+        self.setup(request)
+        if self.include_count and hasattr(view, "aget_count_cache_key"):
+            self.count_cache_key = await view.aget_count_cache_key()
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = DjangoPaginator(queryset, page_size)
+        paginator.count = await self.aget_count(queryset)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+
+        bottom = (number - 1) * page_size
+        top = bottom + page_size
+        if top + paginator.orphans >= paginator.count:
+            top = paginator.count
+        rows = [row async for row in queryset[bottom:top]]
+        self.page = Page(rows, number, paginator)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return rows
+
+    def setup(self, request):
+        self.include_count = request.query_params.get(
+            self.count_query_param, ""
+        ).lower() not in ("false", "0", "no")
+        self.count_is_estimate = False
+        self.count_cache_key = None
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountingPaginator(object_list, per_page, self.get_count)
+
+    def get_count(self, queryset):
+        if not self.include_count:
+            return self.count_through_page(queryset)
+
+        key = self.count_cache_key
+        estimate = None
+        if key is not None:
+            cached = cache.get_many([key, f"{key}:estimate"])
+            if key in cached:
+                return cached[key]
+            estimate = cached.get(f"{key}:estimate")
+
+        if estimate is None:
+            count = queryset[: self.count_limit + 1].count()
+            if count <= self.count_limit:
+                if key is not None:
+                    cache.set(key, count, timeout=self.count_cache_timeout)
+                return count
+            estimate = max(self.count_limit, self.estimate_count(queryset))
+            if key is not None:
+                cache.set(f"{key}:estimate", estimate, timeout=self.count_cache_timeout)
+
+        # Make sure the estimate reaches past the current page.
+        self.count_is_estimate = True
+        page_end = self.get_page_number_value() * self.get_page_size(self.request)
+        if page_end >= estimate:
+            return max(estimate, self.count_through_page(queryset))
+        return estimate
+
+    async def aget_count(self, queryset):
+        """
+        Async version of `get_count()`.
+        """
+        if not self.include_count:
+            return await self.acount_through_page(queryset)
+
+        key = self.count_cache_key
+        estimate = None
+        if key is not None:
+            cached = await async_cache.get_many([key, f"{key}:estimate"])
+            if key in cached:
+                return cached[key]
+            estimate = cached.get(f"{key}:estimate")
+
+        if estimate is None:
+            count = await queryset[: self.count_limit + 1].acount()
+            if count <= self.count_limit:
+                if key is not None:
+                    await async_cache.set(key, count, timeout=self.count_cache_timeout)
+                return count
+            estimate = max(self.count_limit, await self.aestimate_count(queryset))
+            if key is not None:
+                await async_cache.set(
+                    f"{key}:estimate", estimate, timeout=self.count_cache_timeout
+                )
+
+        self.count_is_estimate = True
+        page_end = self.get_page_number_value() * self.get_page_size(self.request)
+        if page_end >= estimate:
+            return max(estimate, await self.acount_through_page(queryset))
+        return estimate
+
+    def estimate_count(self, queryset):
+        """
+        Estimates the number of rows of `queryset` from a sample: the matching
+        rows among `count_sample_size` primary keys, taken in
+        `count_sample_windows` windows spread evenly over the whole key range,
+        scaled up to that range. Each window is a range seek on the primary key,
+        so the cost does not grow with the table.
+        """
+        bounds = queryset.model._default_manager.aggregate(
+            low=Min("pk"), high=Max("pk")
+        )
+        if bounds["low"] is None:
+            return 0
+        sample, sampled, span = self.get_count_sample(queryset, **bounds)
+        return round(sample.count() * span / sampled)
+
+    async def aestimate_count(self, queryset):
+        """
+        Async version of `estimate_count()`.
+        """
+        bounds = await queryset.model._default_manager.aaggregate(
+            low=Min("pk"), high=Max("pk")
+        )
+        if bounds["low"] is None:
+            return 0
+        sample, sampled, span = self.get_count_sample(queryset, **bounds)
+        return round(await sample.acount() * span / sampled)
+
+    def get_count_sample(self, queryset, low, high):
+        """
+        Returns the rows of `queryset` among the sampled primary keys, how many
+        keys were sampled and how many keys there are from `low` to `high`.
+        """
+        span = high - low + 1
+        windows = self.count_sample_windows
+        width = max(min(self.count_sample_size, span) // windows, 1)
+        step = span // windows or 1
+        condition = Q()
+        starts = range(low, high + 1, step)[:windows]
+        for start in starts:
+            condition |= Q(pk__gte=start, pk__lt=start + width)
+        # A subquery, so the sampled keys are looked up first rather than the
+        # rows matching a filter that has an index of its own.
+        keys = queryset.model._default_manager.filter(condition).values("pk")
+        sample = queryset.filter(pk__in=keys).order_by()
+        return sample, width * len(starts), span
+
+    def get_page_number_value(self):
+        try:
+            return max(int(self.request.query_params.get(self.page_query_param)), 1)
+        except (TypeError, ValueError):
+            return 1
+
+    def count_through_page(self, queryset):
+        """
+        Counts the rows up to the end of the requested page, plus one to tell
+        whether there is a next page.
+        """
+        page_end = self.get_page_number_value() * self.get_page_size(self.request)
+        return queryset[: page_end + 1].count()
+
+    async def acount_through_page(self, queryset):
+        page_end = self.get_page_number_value() * self.get_page_size(self.request)
+        return await queryset[: page_end + 1].acount()
+
+    def get_paginated_response(self, data):
+        fields = []
+        if self.include_count:
+            fields.append(("count", self.page.paginator.count))
+            if self.count_is_estimate:
+                fields.append(("count_is_estimate", True))
+        fields += [
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]
+        return Response(OrderedDict(fields))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor based pagination keyed on `(created_at, id)`, newest first.
+
+    Pages are fetched with a `WHERE (created_at, id) < (cursor)` range instead of
+    an `OFFSET`, and the table is never counted, so every page costs the same no
+    matter how deep it is. The `next` and `previous` links carry opaque cursors.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    # Fields every row needs for the cursors, whatever fields the client asked for.
+    required_fields = ("created_at", "id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of `paginate_queryset()`.
+        """
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Returns the query of the requested page, with one extra row.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        self.position, self.reverse = position, reverse
+
+        if reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by("-created_at", "-id")
+
+        if position is not None:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+
+        # Fetch one extra row to find out whether there is another page.
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        """
+        Drops the extra row from the fetched rows and works out the links.
+        """
+        position, reverse = self.position, self.reverse
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        """
+        Returns the `((created_at, id), reverse)` position stored in the cursor.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            payload = json.loads(b64decode(encoded.encode("ascii"), altchars=b"-_"))
+            created_at = parse_datetime(payload["c"])
+            pk = int(payload["i"])
+            reverse = bool(payload.get("r", False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse
+
+    def encode_cursor(self, item, reverse):
+        if isinstance(item, dict):
+            created_at, pk = item["created_at"], item["id"]
+        else:
+            created_at, pk = item.created_at, item.pk
+        payload = {"c": created_at.isoformat(), "i": pk}
+        if reverse:
+            payload["r"] = 1
+        encoded = b64encode(
+            json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+            altchars=b"-_",
+        ).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+def select_pagination_class(request, default, cursor_class=KeysetPagination):
+    """
+    Picks the cursor paginator when the client sends `?pagination=cursor` or a
+    `cursor`, and the view's default paginator otherwise.
+    """
+    params = request.query_params
+    if (
+        params.get("pagination") == "cursor"
+        or cursor_class.cursor_query_param in params
+    ):
+        return cursor_class
+    return default
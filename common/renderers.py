@@ -1,22 +1,37 @@
-import json
-
+import orjson
 from rest_framework import renderers
+from rest_framework.utils import encoders
 
 
-class UserRenderer(renderers.JSONRenderer):
+class JSONRenderer(renderers.JSONRenderer):
     """
-    Custom JSON renderer for user-related responses.
+    JSON renderer writing UTF-8 bytes with orjson.
+
+    Its output matches DRF's compact JSON, except that datetimes left in the
+    data are written by orjson with full precision and a `Z` suffix, like the
+    serializers write them. Decimals and the other types orjson does not know
+    go through DRF's encoder. Indented output (the browsable API) and data
+    orjson refuses fall back to DRF's renderer.
     """
 
-    charset = "utf-8"
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    default = encoders.JSONEncoder().default
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        response = data
+        if data is None:
+            return b""
+
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
 
-        # Ensure errors are not unnecessarily wrapped
-        if isinstance(data, dict) and "errors" in data:
-            response = json.dumps(data)  # Keep the original format
-        else:
-            response = json.dumps(data)
+        try:
+            content = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
 
-        return response
+        # Escape the line terminators JavaScript does not allow in strings, like DRF.
+        if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return content
@@ -0,0 +1,205 @@
+import functools
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from redis.exceptions import RedisError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+# Refills the bucket for the time since the last check and takes one token.
+# Returns whether a token was taken and, if not, the seconds until one is back.
+# The time is the Redis server's, so the clocks of the workers do not matter.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+def take_token(tokens, updated, now, capacity, rate):
+    """
+    Python version of `TOKEN_BUCKET_SCRIPT`. Returns whether a token was taken,
+    the seconds until one is back and the tokens left.
+    """
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return True, 0, tokens - 1
+    return False, (1 - tokens) / rate, tokens
+
+
+class RedisTokenBucket:
+    """
+    Keeps the buckets in the Redis server of a django-redis cache, so every
+    worker and node shares them. Each check is one atomic script call.
+
+    When Redis cannot be reached, requests are let through (and logged)
+    rather than failing.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self.script = None
+
+    def get_client(self):
+        return caches[self.alias].client.get_client(write=True)
+
+    def consume(self, key, capacity, period):
+        try:
+            client = self.get_client()
+            if self.script is None:
+                self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, wait = self.script(
+                keys=[caches[self.alias].make_key(key)],
+                args=[capacity, capacity / period],
+                client=client,
+            )
+        except RedisError:
+            logger.warning("Throttle bucket %s not checked, Redis failed", key)
+            return True, 0
+        return bool(allowed), float(wait)
+
+
+class LocalTokenBucket:
+    """
+    Keeps the buckets in process memory. Meant for tests and single-process
+    deployments, each worker process otherwise has its own buckets.
+    """
+
+    max_keys = 10000
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, period):
+        now = time.monotonic()
+        rate = capacity / period
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+            allowed, wait, tokens = take_token(tokens, updated, now, capacity, rate)
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self.buckets) > self.max_keys:
+                self.prune(now)
+        return allowed, wait
+
+    def prune(self, now):
+        # Buckets that have refilled are the same as missing ones.
+        for key, (_, _, full_at) in list(self.buckets.items()):
+            if full_at <= now:
+                del self.buckets[key]
+
+    def clear(self):
+        with self.lock:
+            self.buckets = {}
+
+
+@functools.cache
+def load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    """
+    Returns the `THROTTLE_BACKEND` instance.
+    """
+    return load_backend(settings.THROTTLE_BACKEND)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle scoped by the view's `throttle_scope`.
+
+    A rate of "5/min" is a bucket of 5 tokens refilled over a minute, so a
+    client can make 5 requests at once and then one every 12 seconds. The
+    rates are read from `DEFAULT_THROTTLE_RATES` under the scope followed by
+    `rate_suffix`.
+    """
+
+    scope_attr = "throttle_scope"
+    rate_suffix = ""
+
+    def __init__(self):
+        # The scope, and so the rate, is only known once the view is.
+        self.retry_after = None
+
+    def get_rate(self):
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f"No default throttle rate set for '{self.scope}' scope"
+            )
+
+    def allow_request(self, request, view):
+        scope = getattr(view, self.scope_attr, None)
+        if not scope:
+            return True
+        self.scope = f"{scope}{self.rate_suffix}"
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = get_backend().consume(
+            self.key, self.num_requests, self.duration
+        )
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Limits the requests from one IP address.
+    """
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class EmailRateThrottle(TokenBucketThrottle):
+    """
+    Limits the requests targeting one email address, whichever IP they come
+    from. Its rates are set under the scope followed by "_email".
+    """
+
+    rate_suffix = "_email"
+
+    def get_cache_key(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Keys hold a digest rather than the address itself.
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {"scope": self.scope, "ident": ident}
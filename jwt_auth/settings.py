@@ -77,6 +77,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + CUSTOM_APPS
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "common.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -169,12 +170,30 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",  # Or other permission classes based on your needs
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",  # Use JWT for authentication
+        "authentication.backends.CachedJWTAuthentication",  # JWT, users cached, usable from async views too
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "common.renderers.JSONRenderer",  # orjson, writes bytes directly
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",  # Default pagination
     "PAGE_SIZE": 10,
+    # Proxies in front of the app; client IPs are read from X-Forwarded-For only behind them
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
+    # Token buckets of the auth endpoints (common.throttling), per IP and per "_email"
+    "DEFAULT_THROTTLE_RATES": {
+        "login": "20/min",
+        "login_email": "5/min",
+        "register": "10/hour",
+        "register_email": "3/hour",
+        "password_reset": "10/hour",
+        "password_reset_email": "3/hour",
+    },
 }
 
+# Where the throttle buckets are kept, LocalTokenBucket keeps them in process
+THROTTLE_BACKEND = "common.throttling.RedisTokenBucket"
+
 # Simple JWT settings
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
@@ -183,14 +202,74 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": False,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
+    "TOKEN_REFRESH_SERIALIZER": "authentication.serializers.TokenRefreshSerializer",
+    "AUTH_TOKEN_CLASSES": ("authentication.tokens.AccessToken",),
 }
 
+# Asymmetric token signing (authentication.keys.KeyRing), published at /.well-known/jwks.json
+# <kid>.pem RSA, Ed25519 or EC keys, unset signs with SIMPLE_JWT's HS256 key
+JWT_SIGNING_KEYS_DIR = os.getenv("JWT_SIGNING_KEYS_DIR")
+# kid new tokens are signed with, needed with more than one private key
+JWT_SIGNING_KEY_ID = os.getenv("JWT_SIGNING_KEY_ID")
+JWT_ACCEPT_LEGACY_TOKENS = True  # Tokens without a kid are checked with SIGNING_KEY
+# Seconds other services may cache the published keys, publish new keys this early
+JWKS_MAX_AGE = 60 * 60 * 24
+
+# Refresh tokens recorded in the background (authentication.outstanding.OutstandingTokenBuffer),
+# opt-in: by default each token is written on the request thread
+OUTSTANDING_TOKEN_WRITE_BEHIND = False
+OUTSTANDING_TOKEN_FLUSH_INTERVAL = 0.2  # Seconds between writes
+OUTSTANDING_TOKEN_BATCH_SIZE = 500  # Tokens waiting before they are written early
+OUTSTANDING_TOKEN_MAX_RETRIES = 3
+OUTSTANDING_TOKEN_MAX_BUFFER = 10000  # Tokens are written inline when it is full
+
+# Expired tokens purged by each server (authentication.purge.TokenPurgeScheduler),
+# opt-in: by default they are only purged with the purge_expired_tokens command
+TOKEN_PURGE_INTERVAL = None  # Seconds between purges, e.g. 60 * 60
+TOKEN_PURGE_BATCH_SIZE = 1000  # Tokens deleted per transaction
+TOKEN_PURGE_PAUSE = 0.05  # Seconds between batches, so logins get the write lock
+# "incremental" runs PRAGMA incremental_vacuum after each purge
+TOKEN_PURGE_VACUUM = None
+
+# Revoked refresh tokens (authentication.revocation), LocalRevocationList keeps them in process
+TOKEN_REVOCATION_BACKEND = "authentication.revocation.RedisRevocationList"
+# Seconds a token revoked elsewhere may still be accepted
+TOKEN_REVOCATION_SYNC_INTERVAL = 1
+# Seconds before the Bloom filter drops expired tokens
+TOKEN_REVOCATION_REBUILD_INTERVAL = 60 * 60
+# Revoked tokens per Bloom filter, 0.1% false positives
+TOKEN_REVOCATION_BLOOM_CAPACITY = 100000
+# Revocations kept for syncing, a lagging process rebuilds
+TOKEN_REVOCATION_LOG_SIZE = 100000
+
+# Tokens checked per request by user/token/introspect/
+TOKEN_INTROSPECTION_MAX_TOKENS = 100
+
 # Custom User Model which should be used
 AUTH_USER_MODEL = "authentication.User"
 
+# Users cached by CachedJWTAuthentication (authentication.cache.UserCache)
+USER_CACHE_LOCAL_SIZE = 1024  # Users kept in each process
+USER_CACHE_LOCAL_TTL = 10  # Seconds another process may serve a user after a change
+USER_CACHE_TIMEOUT = 60 * 5  # Seconds users are kept in Redis
+
 # Reset Password link should be valid
 PASSWORD_RESET_TIMEOUT = 900  # 900 seconds = 15 minutes
 
+# Response compression (common.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024  # Smaller responses are sent uncompressed
+COMPRESSION_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+# Password hashing pool (common.hashing.PasswordHashingService)
+# Threads hashing passwords, 0 hashes on the request thread
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1))
+)
+# Hashes waiting for a worker before requests get a 503, about two hash times
+PASSWORD_HASHING_QUEUE_SIZE = 2 * max(PASSWORD_HASHING_WORKERS, 1)
+PASSWORD_HASHING_TIMEOUT = 5  # Seconds a request waits for its hash before a 503
+PASSWORD_HASHING_RETRY_AFTER = 1  # Seconds, sent as Retry-After with the 503
+
 
 # EMAIL CONFIGURATION
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -199,6 +278,13 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv("EMAIL_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_PASS")
 EMAIL_USE_TLS = True
+EMAIL_TIMEOUT = 10  # Seconds before an SMTP connection attempt or command fails
+
+# Background email queue (common.email.EmailQueue)
+EMAIL_QUEUE_BATCH_SIZE = 50  # Messages sent over one SMTP connection
+EMAIL_QUEUE_MAX_RETRIES = 3
+EMAIL_QUEUE_RETRY_DELAY = 2  # Seconds before the first retry, doubled for each next one
+EMAIL_QUEUE_MAX_SIZE = 1000  # Messages are sent inline when the queue is full
 
 
 # Google authentication settings
@@ -210,6 +296,15 @@ AUTHENTICATION_BACKENDS = (
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = SOCIAL_AUTH_GOOGLE_OAUTH2_KEY
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET
 
+# Google endpoints used by GoogleLoginView (GoogleAuth/client.py)
+GOOGLE_OAUTH2_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_OAUTH2_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_OAUTH2_USERINFO_URL = "https://www.googleapis.com/oauth2/v1/userinfo"
+GOOGLE_OAUTH2_REDIRECT_URI = "http://localhost:8000/complete/google/"  # Ensure this matches what is registered in Google Developer Console
+GOOGLE_OAUTH2_TIMEOUT = (3.05, 10)  # Connect and read timeouts, in seconds
+GOOGLE_OAUTH2_POOL_SIZE = 10  # Keep-alive connections kept per host
+GOOGLE_OAUTH2_CLOCK_SKEW = 30  # Leeway on id_token expiry, in seconds
+
 # REDIS SETTINGS
 CACHES = {
     "default": {
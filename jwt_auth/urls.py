@@ -1,13 +1,14 @@
 from django.contrib import admin
 from django.urls import include, path
 
-from authentication.views import check_server
+from authentication.views import check_server, jwks
 from GoogleAuth.views import GoogleLoginView
 
 # Admin panel URL configuration and Server Health check endpoint
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", check_server, name="check_server"),
+    path(".well-known/jwks.json", jwks, name="jwks"),
 ]
 
 # API endpoint configurations
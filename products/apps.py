@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "products"
+
+    def ready(self):
+        from common import metrics
+
+        from . import signals  # noqa: F401
+        from .cache import product_cache_stats
+
+        metrics.register("product_detail_cache", product_cache_stats.snapshot)
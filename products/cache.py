@@ -0,0 +1,352 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+
+from common.async_cache import async_cache
+
+CATALOG_GENERATION_KEY = "products:generation"
+
+# Total number of products, kept up to date on create/delete.
+PRODUCT_COUNT_KEY = "products:count"
+
+# Rendered product list pages are kept for 15 minutes or until the catalog changes.
+PRODUCT_LIST_CACHE_TIMEOUT = 60 * 15
+
+# Serialized products are evicted on write, so they can live much longer.
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# An evicted product is marked as such for this many seconds, so a reader that
+# loaded it before the eviction cannot put the old version back in the cache.
+PRODUCT_EVICTION_GRACE = 10
+EVICTED = "evicted"
+
+_deferred = threading.local()
+
+
+def get_catalog_generation():
+    """
+    Returns the current catalog generation number.
+
+    Every cached product page is tagged with this number, so bumping it expires
+    all of them at once. A missing counter is seeded from the clock rather than
+    from 1, so a counter evicted by the cache never reuses an old generation.
+    """
+    generation = cache.get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        cache.add(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(CATALOG_GENERATION_KEY)
+    return generation
+
+
+async def aget_catalog_generation():
+    """
+    Async version of `get_catalog_generation()`.
+    """
+    generation = await async_cache.get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        await async_cache.add(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = await async_cache.get(CATALOG_GENERATION_KEY)
+    return generation
+
+
+def bump_catalog_generation():
+    """
+    Moves the catalog to a new generation, expiring every cached product page.
+    """
+    try:
+        cache.incr(CATALOG_GENERATION_KEY)
+    except ValueError:
+        cache.add(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_product_caches(pks=()):
+    """
+    Expires the cached product pages and the cached products with the given ids,
+    unless invalidation is being deferred.
+    """
+    if getattr(_deferred, "active", False):
+        _deferred.pks.update(pks)
+        return
+    bump_catalog_generation()
+    if pks:
+        evict_products(pks)
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collapses every invalidation inside the block into a single one on exit.
+
+    Used by batch writes, so a batch of thousands of rows bumps the catalog
+    generation once instead of once per row. Open it outside the transaction,
+    so the bump happens after the commit. The product count is only adjusted
+    when the block exits without an exception.
+    """
+    if getattr(_deferred, "active", False):
+        yield
+        return
+
+    _deferred.active = True
+    _deferred.pks = set()
+    _deferred.count_delta = 0
+    try:
+        yield
+    except BaseException:
+        # The writes were rolled back, the products are still counted right.
+        _deferred.count_delta = 0
+        raise
+    finally:
+        _deferred.active = False
+        invalidate_product_caches(_deferred.pks)
+        adjust_product_count(_deferred.count_delta)
+
+
+def adjust_product_count(delta):
+    """
+    Adds `delta` to the cached total number of products, if it is cached, once
+    the current transaction commits; nothing is added if it rolls back.
+    Deferred like the invalidation inside `deferred_invalidation()`.
+    """
+    if getattr(_deferred, "active", False):
+        _deferred.count_delta += delta
+        return
+    if delta:
+        transaction.on_commit(lambda: incr_product_count(delta))
+
+
+def incr_product_count(delta):
+    try:
+        cache.incr(PRODUCT_COUNT_KEY, delta)
+    except ValueError:
+        pass
+
+
+def get_product_count_cache_key(request, filter_params):
+    """
+    Builds the cache key of the number of products matching the request's filters.
+
+    The unfiltered total has a fixed key that is updated in place on create and
+    delete. Filtered counts are tagged with the catalog generation instead.
+    """
+    digest = get_count_filters_digest(request, filter_params)
+    if digest is None:
+        return PRODUCT_COUNT_KEY
+    return f"products:count:{get_catalog_generation()}:{digest}"
+
+
+async def aget_product_count_cache_key(request, filter_params):
+    """
+    Async version of `get_product_count_cache_key()`.
+    """
+    digest = get_count_filters_digest(request, filter_params)
+    if digest is None:
+        return PRODUCT_COUNT_KEY
+    return f"products:count:{await aget_catalog_generation()}:{digest}"
+
+
+def get_count_filters_digest(request, filter_params):
+    filters = sorted(
+        (name, request.query_params[name])
+        for name in filter_params
+        if request.query_params.get(name)
+    )
+    if not filters:
+        return None
+    return hashlib.md5(urlencode(filters).encode("utf-8")).hexdigest()
+
+
+def get_product_list_fingerprint(request):
+    """
+    Returns a fingerprint of a product list page as the client would receive it.
+
+    It covers the URL (page, page_size, ordering, filters, ...) with the query
+    parameters sorted, the negotiated media type and the catalog generation, so
+    it changes whenever the page could. It doubles as the page's ETag.
+    """
+    return f"{get_catalog_generation()}-{get_request_digest(request)}"
+
+
+async def aget_product_list_fingerprint(request):
+    """
+    Async version of `get_product_list_fingerprint()`.
+    """
+    return f"{await aget_catalog_generation()}-{get_request_digest(request)}"
+
+
+def get_request_digest(request):
+    params = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    )
+    url = f"{request.build_absolute_uri(request.path)}?{urlencode(params)}"
+    return hashlib.md5(
+        f"{url}|{request.accepted_media_type}".encode("utf-8")
+    ).hexdigest()
+
+
+def get_product_list_cache_key(fingerprint):
+    """
+    Builds the cache key of a rendered product list page.
+    """
+    return f"products:list:{fingerprint}"
+
+
+class CacheStats:
+    """
+    Counts hits and misses of a cache.
+
+    Counts are kept in process and added to shared counters in the cache every
+    `flush_every` lookups, so the reported ratio covers every worker without a
+    cache write on each request.
+    """
+
+    def __init__(self, name, flush_every=100):
+        self.name = name
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, hits=0, misses=0):
+        counts = self.count(hits, misses)
+        if counts is not None:
+            self.add_to_shared(*counts)
+
+    async def arecord(self, hits=0, misses=0):
+        counts = self.count(hits, misses)
+        if counts is not None:
+            await self.aadd_to_shared(*counts)
+
+    def count(self, hits, misses):
+        """
+        Adds to the in-process counts, and returns them when they are due to be
+        added to the shared counters.
+        """
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            if self.hits + self.misses < self.flush_every:
+                return None
+            counts = self.hits, self.misses
+            self.hits = self.misses = 0
+        return counts
+
+    def add_to_shared(self, hits, misses):
+        for suffix, count in (("hits", hits), ("misses", misses)):
+            if not count:
+                continue
+            key = f"{self.name}:{suffix}"
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                pass
+
+    async def aadd_to_shared(self, hits, misses):
+        for suffix, count in (("hits", hits), ("misses", misses)):
+            if not count:
+                continue
+            key = f"{self.name}:{suffix}"
+            await async_cache.add(key, 0, timeout=None)
+            try:
+                await async_cache.incr(key, count)
+            except ValueError:
+                pass
+
+    def snapshot(self):
+        """
+        Returns the hit/miss counts and ratio across all workers.
+        """
+        shared = cache.get_many([f"{self.name}:hits", f"{self.name}:misses"])
+        with self.lock:
+            hits = shared.get(f"{self.name}:hits", 0) + self.hits
+            misses = shared.get(f"{self.name}:misses", 0) + self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+product_cache_stats = CacheStats("products:detail:stats")
+
+
+def get_product_cache_key(pk):
+    return f"products:detail:{pk}"
+
+
+def get_cached_product(pk):
+    """
+    Returns the serialized product with the given id, or None when it is not cached.
+    """
+    data = cache.get(get_product_cache_key(pk))
+    if data is None or data == EVICTED:
+        data = None
+        product_cache_stats.record(misses=1)
+    else:
+        product_cache_stats.record(hits=1)
+    return data
+
+
+async def aget_cached_product(pk):
+    """
+    Async version of `get_cached_product()`.
+    """
+    data = await async_cache.get(get_product_cache_key(pk))
+    if data is None or data == EVICTED:
+        data = None
+        await product_cache_stats.arecord(misses=1)
+    else:
+        await product_cache_stats.arecord(hits=1)
+    return data
+
+
+def get_cached_products(pks):
+    """
+    Returns `{id: serialized product}` for the cached products among `pks`,
+    fetched in a single round trip (`MGET` on Redis).
+    """
+    keys = {get_product_cache_key(pk): pk for pk in pks}
+    found = {key: data for key, data in cache.get_many(keys).items() if data != EVICTED}
+    product_cache_stats.record(hits=len(found), misses=len(keys) - len(found))
+    return {keys[key]: data for key, data in found.items()}
+
+
+def fill_products(products):
+    """
+    Stores serialized products read after a cache miss, unless the product was
+    written or evicted in the meantime, in which case the data read may be old.
+    """
+    for data in products:
+        cache.add(
+            get_product_cache_key(data["id"]),
+            dict(data),
+            timeout=PRODUCT_DETAIL_CACHE_TIMEOUT,
+        )
+
+
+async def afill_products(products):
+    """
+    Async version of `fill_products()`.
+    """
+    for data in products:
+        await async_cache.add(
+            get_product_cache_key(data["id"]),
+            dict(data),
+            timeout=PRODUCT_DETAIL_CACHE_TIMEOUT,
+        )
+
+
+def evict_products(pks):
+    """
+    Evicts products, marking them evicted for `PRODUCT_EVICTION_GRACE` seconds.
+    """
+    cache.set_many(
+        {get_product_cache_key(pk): EVICTED for pk in pks},
+        timeout=PRODUCT_EVICTION_GRACE,
+    )
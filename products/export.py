@@ -0,0 +1,99 @@
+import csv
+import json
+import zlib
+
+from .models import Product
+
+EXPORT_FIELDS = ("id", "name", "description", "price", "created_at", "updated_at")
+
+# Output is handed to the server in chunks of about this many bytes.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    File-like object whose `write` returns the value, so `csv.writer` can be
+    used to format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def format_datetime(value):
+    """
+    Formats a datetime the way `ProductSerializer` does.
+    """
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def iter_products(chunk_size):
+    """
+    Yields every product as a tuple of `EXPORT_FIELDS`, reading `chunk_size`
+    rows at a time from a server-side cursor so memory stays flat.
+    """
+    rows = (
+        Product.objects.order_by("id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for pk, name, description, price, created_at, updated_at in rows:
+        yield (
+            pk,
+            name,
+            description,
+            str(price),
+            format_datetime(created_at),
+            format_datetime(updated_at),
+        )
+
+
+def ndjson_lines(rows):
+    """
+    Formats rows as newline delimited JSON objects.
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows):
+    """
+    Formats rows as CSV with a header line.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def encode_chunks(lines, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Encodes lines to UTF-8 and joins them into chunks of about `chunk_size` bytes.
+    """
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresses a stream of byte chunks into a single gzip stream on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,108 @@
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+# Upper bound used to turn a name prefix into a range, see ProductFilter.
+MAX_CHARACTER = "\U0010ffff"
+
+
+def parse_decimal(name, value):
+    """
+    Parses a finite decimal number; NaN and infinities are rejected.
+    """
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError({name: "Enter a valid number."})
+    return number
+
+
+def parse_moment(name, value):
+    """
+    Parses an ISO 8601 datetime or date; a bare date means midnight.
+    """
+    try:
+        moment = parse_datetime(value)
+        date = parse_date(value) if moment is None else None
+    except ValueError:
+        # Well formed but out of range, like 2020-13-01.
+        moment = date = None
+    if moment is None:
+        if date is None:
+            raise ValidationError({name: "Enter a valid date or datetime."})
+        moment = datetime.combine(date, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ProductFilter(BaseFilterBackend):
+    """
+    Filters the product list with query parameters:
+
+    - `min_price` / `max_price`: Inclusive price range.
+    - `created_after` / `created_before`: Inclusive `created_at` window.
+    - `updated_after` / `updated_before`: Inclusive `updated_at` window.
+    - `name`: Case sensitive name prefix.
+
+    Every filter is a range on an indexed column. The name prefix is written as
+    `name >= prefix AND name < prefix + U+10FFFF` rather than `LIKE`, because
+    SQLite's case insensitive `LIKE` cannot use the index.
+
+    A filter is served by the same index as the ordering only when the list is
+    ordered by the filtered field. With the default `id` ordering, SQLite either
+    walks the primary key and skips the rows that do not match, which stops after
+    one page unless the filter is very selective, or searches the filter's index
+    and sorts the matching rows.
+    """
+
+    ranges = {
+        "min_price": ("price__gte", parse_decimal),
+        "max_price": ("price__lte", parse_decimal),
+        "created_after": ("created_at__gte", parse_moment),
+        "created_before": ("created_at__lte", parse_moment),
+        "updated_after": ("updated_at__gte", parse_moment),
+        "updated_before": ("updated_at__lte", parse_moment),
+    }
+    params = (*ranges, "name")
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+
+        for name, (lookup, parse) in self.ranges.items():
+            value = params.get(name)
+            if value:
+                filters[lookup] = parse(name, value)
+
+        prefix = params.get("name")
+        if prefix:
+            filters["name__gte"] = prefix
+            filters["name__lt"] = prefix + MAX_CHARACTER
+
+        return queryset.filter(**filters)
+
+
+class ProductOrdering(OrderingFilter):
+    """
+    Orders the product list by one whitelisted field, `?ordering=-price` for example.
+
+    Only the first field is used and `id` is added as a tie breaker in the same
+    direction, so each ordering is served by one `(field, id)` index.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+
+        field = ordering[0]
+        if field.lstrip("-") == "id":
+            return [field]
+        return [field, "-id" if field.startswith("-") else "id"]
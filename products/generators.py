@@ -0,0 +1,41 @@
+"""
+Fake data generators for the `create_products` command.
+
+They run in worker processes, so this module must not import Django models.
+Every batch gets its own seed, which makes the output of a seeded run the same
+whatever the number of workers.
+"""
+
+import random
+
+from faker import Faker
+
+fake = Faker()
+
+
+def generate_products(seed, size):
+    """
+    Returns `size` products as `(name, description, price)` tuples.
+    """
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    return [
+        (
+            fake.word().capitalize() + " " + fake.word().capitalize(),
+            fake.sentence(nb_words=10),
+            f"{rng.uniform(5.0, 500.0):.2f}",
+        )
+        for _ in range(size)
+    ]
+
+
+def generate_users(seed, start, size):
+    """
+    Returns `size` users as `(email, name)` tuples. Emails are numbered from
+    `start`, so they are unique across batches.
+    """
+    fake.seed_instance(seed)
+    return [
+        (f"loadtest{number}@example.com", fake.name())
+        for number in range(start, start + size)
+    ]
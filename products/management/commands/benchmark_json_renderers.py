@@ -0,0 +1,71 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import renderers
+
+from common.renderers import JSONRenderer
+from products.models import Product
+from products.serializers import get_product_row_serializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the orjson renderer with json.dumps (the former UserRenderer) and "
+        "DRF's JSONRenderer on product pages of different sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-sizes",
+            default="10,100,1000,10000",
+            help="Comma separated page sizes (default: 10,100,1000,10000).",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100,
+            help="Pages rendered per measurement (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        row_serializer = get_product_row_serializer()
+        drf_renderer = renderers.JSONRenderer()
+        renderer = JSONRenderer()
+        iterations = options["iterations"]
+
+        self.stdout.write(
+            f"{'page size':>10} {'json.dumps':>14} {'DRF':>14} {'orjson':>14} "
+            f"{'speedup':>9}"
+        )
+        for page_size in [int(size) for size in options["page_sizes"].split(",")]:
+            rows = row_serializer.many(
+                Product.objects.order_by("id").values(*row_serializer.sources)[
+                    :page_size
+                ]
+            )
+            if len(rows) < page_size:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Only {len(rows)} products for a page of {page_size}."
+                    )
+                )
+            data = {"count": len(rows), "next": None, "previous": None, "results": rows}
+
+            if renderer.render(data) != drf_renderer.render(data):
+                raise CommandError(f"Outputs differ for a page of {page_size}.")
+
+            timings = [
+                timeit.timeit(render, number=iterations) / iterations
+                for render in (
+                    # The response encodes the str UserRenderer returned.
+                    lambda: json.dumps(data).encode("utf-8"),
+                    lambda: drf_renderer.render(data),
+                    lambda: renderer.render(data),
+                )
+            ]
+            self.stdout.write(
+                f"{page_size:>10} "
+                + " ".join(f"{timing * 1000:>11.3f} ms" for timing in timings)
+                + f" {timings[0] / timings[2]:>8.1f}x"
+            )
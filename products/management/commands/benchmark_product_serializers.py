@@ -0,0 +1,64 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductSerializer, get_product_row_serializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer with the values() fast path on product pages "
+        "of different sizes, checking that both render the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-sizes",
+            default="10,100,1000",
+            help="Comma separated page sizes (default: 10,100,1000).",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100,
+            help="Pages fetched and serialized per measurement (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        row_serializer = get_product_row_serializer()
+        queryset = Product.objects.order_by("id")
+        iterations = options["iterations"]
+
+        self.stdout.write(
+            f"{'page size':>10} {'serializer':>14} {'fast path':>14} {'speedup':>9}"
+        )
+        for page_size in [int(size) for size in options["page_sizes"].split(",")]:
+
+            def serializer_page():
+                return ProductSerializer(queryset[:page_size], many=True).data
+
+            def fast_page():
+                return row_serializer.many(
+                    queryset.values(*row_serializer.sources)[:page_size]
+                )
+
+            if renderer.render(serializer_page()) != renderer.render(fast_page()):
+                raise CommandError(f"Outputs differ for a page of {page_size}.")
+
+            rows = queryset[:page_size].count()
+            if rows < page_size:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Only {rows} products for a page of {page_size}."
+                    )
+                )
+
+            slow = timeit.timeit(serializer_page, number=iterations) / iterations
+            fast = timeit.timeit(fast_page, number=iterations) / iterations
+            self.stdout.write(
+                f"{page_size:>10} {slow * 1000:>11.3f} ms {fast * 1000:>11.3f} ms "
+                f"{slow / fast:>8.1f}x"
+            )
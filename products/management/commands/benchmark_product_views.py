@@ -0,0 +1,127 @@
+import http.client
+import itertools
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from authentication.tokens import RefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Load running servers with concurrent GET requests and report the "
+        "throughput and latency of each URL, e.g. /api/products/ under a WSGI "
+        "server against /api/products/async/ under uvicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            required=True,
+            help="URL to load, optionally prefixed with a label (label=url). "
+            "Can be given several times.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Requests sent to each URL (default: 2000).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Requests in flight at once, one keep-alive connection each "
+            "(default: 50).",
+        )
+        parser.add_argument(
+            "--email",
+            help="User the access token is issued for (default: the first admin).",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options["email"]:
+            user = users.filter(email=options["email"]).first()
+        else:
+            user = users.filter(is_admin=True).order_by("id").first()
+        if user is None:
+            raise CommandError("No user to issue an access token for.")
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}",
+            "Accept": "application/json",
+        }
+
+        self.stdout.write(
+            f"{'url':>10} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}"
+        )
+        for target in options["url"]:
+            label, separator, url = target.partition("=")
+            if not separator or "://" in label:
+                label, url = urlsplit(target).netloc, target
+            latencies, errors, elapsed = self.load(
+                url, headers, options["requests"], options["concurrency"]
+            )
+            if not latencies:
+                raise CommandError(f"Every request to {url} failed.")
+
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"{label:>10} {len(latencies) / elapsed:>9.1f} "
+                f"{quantiles[49] * 1000:>6.1f} ms {quantiles[94] * 1000:>6.1f} ms "
+                f"{quantiles[98] * 1000:>6.1f} ms {errors:>7}"
+            )
+
+    def load(self, url, headers, total, concurrency):
+        """
+        Sends `total` GET requests to `url` from `concurrency` threads, and
+        returns the latencies of the successful ones, the number of failed ones
+        and the elapsed time.
+        """
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        sent = itertools.count()
+
+        def worker():
+            connection = connection_class(parts.hostname, parts.port, timeout=30)
+            latencies = []
+            errors = 0
+            while next(sent) < total:
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    errors += 1
+                    continue
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+            connection.close()
+            return latencies, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = [executor.submit(worker) for _ in range(concurrency)]
+            results = [future.result() for future in results]
+        elapsed = time.perf_counter() - start
+
+        latencies = [
+            latency for worker_latencies, _ in results for latency in worker_latencies
+        ]
+        return latencies, sum(errors for _, errors in results), elapsed
@@ -1,28 +1,176 @@
+import argparse
 import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
 from django.utils.timezone import now
-from faker import Faker
 
+from products.cache import adjust_product_count, deferred_invalidation
+from products.generators import generate_products, generate_users
 from products.models import Product
 
-fake = Faker()
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a non-negative integer")
+    return number
 
 
 class Command(BaseCommand):
-    help = "Generate 1000 random products"
+    help = (
+        "Generate random products (and optionally users) for load testing. "
+        "Rows are generated by worker processes and inserted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=non_negative_int,
+            default=1000,
+            help="Number of products to create (default: 1000).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=positive_int,
+            default=1000,
+            help="Number of rows generated and inserted at a time (default: 1000).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=positive_int,
+            default=1,
+            help="Number of processes generating rows (default: 1).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Seed for reproducible data (default: random).",
+        )
+        parser.add_argument(
+            "--users",
+            type=non_negative_int,
+            default=0,
+            help="Number of users to create as well (default: 0).",
+        )
+        parser.add_argument(
+            "--user-password",
+            default="password@123",
+            help="Password of the generated users, hashed once for all of them.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.workers = options["workers"]
+        seed = options["seed"]
+        if seed is None:
+            seed = random.randrange(2**32)
+
+        count = options["count"]
+        if count:
+            with deferred_invalidation():
+                self.run(
+                    "products", count, seed, self.product_batches, self.insert_products
+                )
+                adjust_product_count(count)
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Successfully created {count} products!")
+            )
+
+        users = options["users"]
+        if users:
+            self.password = make_password(options["user_password"])
+            created = self.run(
+                "users", users, seed, self.user_batches, self.insert_users
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Successfully created {created} users!")
+            )
+
+    def product_batches(self, count, seed):
+        for index, start in enumerate(range(0, count, self.batch_size)):
+            yield generate_products, (seed + index, min(self.batch_size, count - start))
+
+    def user_batches(self, count, seed):
+        for index, start in enumerate(range(0, count, self.batch_size)):
+            size = min(self.batch_size, count - start)
+            yield generate_users, (seed + index, start, size)
 
-    def handle(self, *args, **kwargs):
-        products = [
+    def insert_products(self, rows):
+        created_at = now()
+        Product.objects.bulk_create(
             Product(
-                name=fake.word().capitalize() + " " + fake.word().capitalize(),
-                description=fake.sentence(nb_words=10),
-                price=round(random.uniform(5.0, 500.0), 2),
-                created_at=now(),
-                updated_at=now(),
+                name=name,
+                description=description,
+                price=price,
+                created_at=created_at,
+                updated_at=created_at,
             )
-            for _ in range(1000)
-        ]
+            for name, description, price in rows
+        )
+        return len(rows)
+
+    def insert_users(self, rows):
+        User = get_user_model()
+        # bulk_create returns every object it was given, even with
+        # ignore_conflicts, so users that already exist are counted first.
+        existing = User.objects.filter(email__in=[email for email, _ in rows]).count()
+        User.objects.bulk_create(
+            (
+                User(email=email, name=name, tc=True, password=self.password)
+                for email, name in rows
+            ),
+            ignore_conflicts=True,
+        )
+        return len(rows) - existing
+
+    def run(self, label, count, seed, batches, insert):
+        """
+        Generates the batches (in worker processes when `--workers` > 1) and
+        inserts them as they arrive. At most two batches per worker are in flight,
+        so memory use does not depend on `count`.
+        """
+        started = last_report = time.monotonic()
+        done = 0
+
+        def report(final=False):
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f"{done}/{count} {label} ({done / elapsed:,.0f} rows/s)",
+                ending="\n" if final else "\r",
+            )
+
+        def consume(rows):
+            nonlocal done, last_report
+            done += insert(rows)
+            if time.monotonic() - last_report >= 1:
+                last_report = time.monotonic()
+                report()
+
+        if self.workers <= 1:
+            for generate, arguments in batches(count, seed):
+                consume(generate(*arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                pending = deque()
+                for generate, arguments in batches(count, seed):
+                    pending.append(executor.submit(generate, *arguments))
+                    if len(pending) >= self.workers * 2:
+                        consume(pending.popleft().result())
+                while pending:
+                    consume(pending.popleft().result())
 
-        Product.objects.bulk_create(products)
-        self.stdout.write(self.style.SUCCESS("✅ Successfully created 1000 products!"))
+        report(final=True)
+        return done
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product full-text search index from scratch, in batches, "
+        "in one transaction. Product writes wait until it is done."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of products read and indexed at a time (default: 5000).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(total):
+            self.stdout.write(f"Indexed {total} products...")
+
+        total = rebuild_search_index(options["batch_size"], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Indexed {total} products in {elapsed:.1f}s!")
+        )
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# The FTS5 index is an external content table over products_product, kept in
+# sync by triggers, so bulk_create/bulk_update and raw SQL writes are indexed
+# too. SQLite drops the triggers when a migration rebuilds products_product, so
+# such a migration has to recreate them.
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name,
+        description,
+        content='products_product',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER products_product_fts_insert AFTER INSERT ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_delete AFTER DELETE ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_update
+    AFTER UPDATE OF name, description ON products_product
+    BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS products_product_fts_insert",
+    "DROP TRIGGER IF EXISTS products_product_fts_delete",
+    "DROP TRIGGER IF EXISTS products_product_fts_update",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_product_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_sqlite(CREATE_SEARCH_INDEX), run_sqlite(DROP_SEARCH_INDEX)
+        ),
+    ]
@@ -0,0 +1,111 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Product
+
+SEARCH_TABLE = "products_product_fts"
+
+# bm25() column weights: a match in the name counts five times one in the description.
+NAME_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def build_match_query(text):
+    """
+    Turns user input into an FTS5 query that matches every word, the last one as a
+    prefix. Words are quoted, so FTS5 operators and punctuation in the input are
+    never interpreted.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class ProductSearchResults:
+    """
+    Lazy, sliceable sequence of the products matching a search, best match first.
+
+    Slicing runs one ranked query for just that page, and `count()` counts the
+    matches in the index, so it can be handed to the regular paginator.
+    `columns` limits the columns read, the others are deferred.
+    """
+
+    def __init__(self, match_query, columns=None):
+        self.match_query = match_query
+        if columns is None:
+            self.select = "product.*"
+        else:
+            names = dict.fromkeys(["id", *columns])
+            self.select = ", ".join(f"product.{name}" for name in names)
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+                [self.match_query],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+
+        start = index.start or 0
+        limit = -1 if index.stop is None else max(index.stop - start, 0)
+        return list(
+            Product.objects.raw(
+                f"""
+                SELECT {self.select}
+                FROM {SEARCH_TABLE}
+                JOIN products_product AS product ON product.id = {SEARCH_TABLE}.rowid
+                WHERE {SEARCH_TABLE} MATCH %s
+                ORDER BY bm25({SEARCH_TABLE}, %s, %s), product.id
+                LIMIT %s OFFSET %s
+                """,
+                [self.match_query, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit, start],
+            )
+        )
+
+
+def rebuild_search_index(batch_size, progress=None):
+    """
+    Empties the search index and fills it again from `products_product`,
+    `batch_size` rows at a time in id order.
+
+    Everything runs in one transaction, so searches keep seeing the old index
+    until the new one is complete, and product writes wait until it is.
+    `progress` is called with the number of rows indexed so far after each batch.
+    Returns the total number of rows indexed.
+    """
+    total = 0
+    last_id = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('delete-all')"
+        )
+        while True:
+            cursor.execute(
+                "SELECT id, name, description FROM products_product "
+                "WHERE id > %s ORDER BY id LIMIT %s",
+                [last_id, batch_size],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) "
+                "VALUES (%s, %s, %s)",
+                rows,
+            )
+            last_id = rows[-1][0]
+            total += len(rows)
+            if progress is not None:
+                progress(total)
+    return total
@@ -1,9 +1,233 @@
-from rest_framework import serializers
+import decimal
+import functools
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from common.fieldsets import DynamicFieldsMixin
 
 from .models import Product
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = "__all__"
+
+
+def get_field_converter(field):
+    """
+    Returns a function giving the same output as `field.to_representation` for
+    a non-null database value, with the field's settings worked out up front.
+    """
+    if isinstance(field, serializers.DecimalField) and not (
+        field.localize or field.normalize_output
+    ):
+        if not getattr(
+            field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+        ):
+            return field.to_representation
+
+        quantum = decimal.Decimal(".1") ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def convert_decimal(value):
+            return "{:f}".format(
+                value.quantize(quantum, rounding=field.rounding, context=context)
+            )
+
+        return convert_decimal
+
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        field_timezone = getattr(field, "timezone", field.default_timezone())
+        if output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert_datetime(value):
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        return convert_datetime
+
+    if isinstance(field, (serializers.IntegerField, serializers.CharField)):
+        # Database values already have the output type.
+        return None
+
+    return field.to_representation
+
+
+class ProductRowSerializer:
+    """
+    Read-only fast path for `ProductSerializer` that works on `.values()` rows.
+
+    It skips model instances and DRF's per-row field machinery: the converters
+    of `ProductSerializer`'s fields are derived once, and each row becomes a dict
+    with the same keys, order and values as `ProductSerializer(product).data`.
+    `fields` limits the output like `ProductSerializer(fields=...)`.
+    """
+
+    serializer_class = ProductSerializer
+
+    def __init__(self, fields=None):
+        self.fields = [
+            (name, field.source, get_field_converter(field))
+            for name, field in self.serializer_class(fields=fields).fields.items()
+            if not field.write_only
+        ]
+        self.field_names = [name for name, _, _ in self.fields]
+        self.sources = [source for _, source, _ in self.fields]
+
+    def to_representation(self, row):
+        data = {}
+        for name, source, convert in self.fields:
+            value = row[source]
+            if value is not None and convert is not None:
+                value = convert(value)
+            data[name] = value
+        return data
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+@functools.cache
+def get_product_row_serializer(fields=None):
+    """
+    Returns the shared row serializer for a tuple of fields, or all fields.
+    """
+    return ProductRowSerializer(fields)
+
+
+class ProductBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates and writes a whole batch of products in one pass.
+
+    Items without an `id` are created, items with an `id` are updated and items
+    with an `id` and `"delete": true` are removed. Everything is written with
+    `bulk_create`/`bulk_update` and one DELETE statement inside a transaction.
+    Deletes skip the `post_delete` signal, the caller invalidates the caches
+    and the product count for the whole batch.
+    """
+
+    batch_size = 500
+
+    def to_internal_value(self, data):
+        """
+        Validates every item, then checks with a single query that each referenced
+        product exists and is referenced only once. Errors line up with the items.
+        """
+        attrs = super().to_internal_value(data)
+        ids = [item["id"] for item in attrs if "id" in item]
+        existing = set(Product.objects.filter(id__in=ids).values_list("id", flat=True))
+
+        errors = []
+        seen = set()
+        for item in attrs:
+            pk = item.get("id")
+            if pk is None:
+                errors.append({})
+            elif pk in seen:
+                errors.append({"id": f"Product {pk} appears more than once."})
+            elif pk not in existing:
+                errors.append({"id": f"Product {pk} does not exist."})
+            else:
+                errors.append({})
+            seen.add(pk)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def save(self, **kwargs):
+        """
+        Writes the batch and returns one `{"id", "status"}` result per item.
+        """
+        to_create = []
+        to_update = {}
+        to_delete = []
+        results = []
+        now = timezone.now()
+
+        for item in self.validated_data:
+            item = dict(item)
+            delete = item.pop("delete", False)
+            pk = item.pop("id", None)
+
+            if pk is None:
+                result = {"id": None, "status": "created"}
+                to_create.append((Product(**item), result))
+                results.append(result)
+            elif delete:
+                to_delete.append(pk)
+                results.append({"id": pk, "status": "deleted"})
+            else:
+                # bulk_update() skips auto_now, so updated_at is set by hand.
+                fields = tuple(sorted(item)) + ("updated_at",)
+                product = Product(id=pk, updated_at=now, **item)
+                to_update.setdefault(fields, []).append(product)
+                results.append({"id": pk, "status": "updated"})
+
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                [product for product, _ in to_create], batch_size=self.batch_size
+            )
+            for fields, products in to_update.items():
+                Product.objects.bulk_update(
+                    products, fields, batch_size=self.batch_size
+                )
+            if to_delete:
+                # The rows are loaded in one query and deleted in batches of
+                # DELETE ... IN. The post_delete receivers evict and uncount
+                # each product, so call this inside deferred_invalidation().
+                Product.objects.filter(id__in=to_delete).delete()
+
+        for product, result in to_create:
+            result["id"] = product.id
+        return results
+
+
+class ProductBulkSerializer(ProductSerializer):
+    """
+    Serializer for one item of a bulk product request.
+
+    Fields:
+        - id (int): Product to update or delete; omitted for new products.
+        - delete (bool): Removes the product with the given `id`.
+        - name, description, price: Required for new products only.
+    """
+
+    id = serializers.IntegerField(required=False, min_value=1)
+    delete = serializers.BooleanField(required=False, write_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        list_serializer_class = ProductBulkListSerializer
+
+    def validate(self, attrs):
+        """
+        Checks the fields each kind of operation needs.
+        """
+        if attrs.get("delete"):
+            if "id" not in attrs:
+                raise serializers.ValidationError(
+                    {"id": "This field is required to delete a product."}
+                )
+        elif "id" not in attrs:
+            missing = [
+                field
+                for field in ("name", "description", "price")
+                if field not in attrs
+            ]
+            if missing:
+                raise serializers.ValidationError(
+                    {field: "This field is required." for field in missing}
+                )
+        return attrs
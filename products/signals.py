@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import adjust_product_count, invalidate_product_caches
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    """
+    Expires every cached product page and the product itself whenever a product
+    is saved, and counts new products.
+    """
+    invalidate_product_caches([instance.pk])
+    if created:
+        adjust_product_count(1)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    """
+    Expires every cached product page and the product itself whenever a product
+    is deleted, and uncounts it.
+    """
+    invalidate_product_caches([instance.pk])
+    adjust_product_count(-1)
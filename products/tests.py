@@ -1,3 +1,1064 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import uuid
+from base64 import b64encode
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import zstandard
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (AsyncClient, RequestFactory, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework import renderers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from authentication.models import User
+from authentication.tests import TEST_SETTINGS
+from authentication.views import get_tokens_for_user
+from common.middleware import CompressionMiddleware
+from common.pagination import CachedCountPagination, KeysetPagination
+from common.renderers import JSONRenderer
+
+from .cache import (EVICTED, PRODUCT_COUNT_KEY, deferred_invalidation,
+                    fill_products, get_product_cache_key)
+from .export import EXPORT_FIELDS
+from .models import Product
+from .search import (SEARCH_TABLE, ProductSearchResults, build_match_query,
+                     rebuild_search_index)
+from .serializers import (ProductRowSerializer, ProductSerializer,
+                          get_product_row_serializer)
+from .views import ProductDetailView, ProductListView
+
+
+class ProductTestCase(TestCase):
+    """
+    Products and a signed-in user, with the caches in process memory.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            "jane@example.com", "Jane", True, "pw"
+        )
+        self.headers = {
+            "Authorization": f"Bearer {get_tokens_for_user(self.user)['access']}"
+        }
+        self.products = [
+            Product.objects.create(name=name, description="", price=price)
+            for name, price in (("Lamp", "10.00"), ("Desk", "120.50"), ("Chair", "45"))
+        ]
+        # Starts cold, without the eviction markers the writes above left.
+        cache.clear()
+        self.client = APIClient(headers=self.headers)
+
+
+class ProductListQueryPlanTests(TestCase):
+    """
+    Every filter and ordering of the product list must be served by an index.
+    """
+
+    def get_queryset(self, params):
+        request = Request(APIRequestFactory().get("/api/products/", params))
+        view = ProductListView(request=request, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def get_query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, params, index):
+        plan = self.get_query_plan(self.get_queryset(params))
+        self.assertTrue(
+            any(index in step for step in plan), f"{index} not used: {plan}"
+        )
+        for step in plan:
+            self.assertNotIn("TEMP B-TREE", step, plan)
+            if step.startswith("SCAN"):
+                self.assertIn("USING", step, plan)
+
+    def test_price_range(self):
+        self.assertUsesIndex(
+            {"min_price": "10", "max_price": "20", "ordering": "price"},
+            "product_price_id_idx",
+        )
+
+    def test_created_window(self):
+        self.assertUsesIndex(
+            {
+                "created_after": "2025-01-01",
+                "created_before": "2025-02-01T12:00:00Z",
+                "ordering": "-created_at",
+            },
+            "product_created_id_idx",
+        )
+
+    def test_updated_window(self):
+        self.assertUsesIndex(
+            {"updated_after": "2025-01-01", "ordering": "updated_at"},
+            "product_updated_id_idx",
+        )
+
+    def test_name_prefix(self):
+        self.assertUsesIndex(
+            {"name": "Blue", "ordering": "name"}, "product_name_id_idx"
+        )
+
+    def test_orderings(self):
+        for field, index in (
+            ("price", "product_price_id_idx"),
+            ("-name", "product_name_id_idx"),
+            ("created_at", "product_created_id_idx"),
+            ("-updated_at", "product_updated_id_idx"),
+        ):
+            with self.subTest(ordering=field):
+                self.assertUsesIndex({"ordering": field}, index)
+
+    def test_default_ordering(self):
+        # Rows are read in primary key order, without a sort step.
+        plan = self.get_query_plan(self.get_queryset({}))
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+    def test_filter_with_the_default_ordering(self):
+        # Either a walk of the primary key without a sort step, or a search of
+        # the filter's index with one; never a full scan followed by a sort.
+        for params, index in (
+            ({"min_price": "10"}, "product_price_id_idx"),
+            ({"created_after": "2025-01-01"}, "product_created_id_idx"),
+            (
+                {"updated_before": "2025-01-01", "ordering": "-id"},
+                "product_updated_id_idx",
+            ),
+            ({"name": "Blue"}, "product_name_id_idx"),
+        ):
+            with self.subTest(**params):
+                plan = self.get_query_plan(self.get_queryset(params))
+                if any("TEMP B-TREE" in step for step in plan):
+                    self.assertTrue(
+                        any(index in step for step in plan), f"{index} not used: {plan}"
+                    )
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductFilterTests(ProductTestCase):
+    def get_names(self, params):
+        response = self.client.get("/api/products/", params)
+        self.assertEqual(response.status_code, 200, response.json())
+        return [product["name"] for product in response.json()["results"]]
+
+    def test_ranges(self):
+        self.assertEqual(
+            self.get_names({"min_price": "10", "max_price": "45"}), ["Lamp", "Chair"]
+        )
+        self.assertEqual(
+            self.get_names({"created_after": "2000-01-01"}), ["Lamp", "Desk", "Chair"]
+        )
+        self.assertEqual(self.get_names({"updated_before": "2000-01-01"}), [])
+
+    def test_invalid_number(self):
+        for value in ("ten", "NaN", "-Infinity", "sNaN"):
+            with self.subTest(value=value):
+                response = self.client.get("/api/products/", {"min_price": value})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json()["errors"], {"min_price": "Enter a valid number."}
+                )
+
+    def test_invalid_date(self):
+        for value in ("yesterday", "2020-13-01", "2020-02-30", "2020-01-01T25:00:00"):
+            with self.subTest(value=value):
+                response = self.client.get("/api/products/", {"created_after": value})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json()["errors"],
+                    {"created_after": "Enter a valid date or datetime."},
+                )
+
+
+@override_settings(**TEST_SETTINGS)
+class AsyncProductViewTests(ProductTestCase):
+    def get(self, path, etag=None):
+        headers = dict(self.headers)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return async_to_sync(AsyncClient().get)(path, headers=headers)
+
+    def test_list(self):
+        response = self.get("/api/products/async/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(
+            [product["name"] for product in response.json()["results"]],
+            ["Lamp", "Desk", "Chair"],
+        )
+        revalidated = self.get("/api/products/async/", etag=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_list_fields(self):
+        response = self.get("/api/products/async/?fields=id,name")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"][0], {"id": self.products[0].id, "name": "Lamp"}
+        )
+
+    def test_detail(self):
+        path = f"/api/products/async/{self.products[1].id}/"
+
+        response = self.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["price"], "120.50")
+        self.assertEqual(self.get(path, etag=response["ETag"]).status_code, 304)
+        sparse = self.get(f"{path}?fields=name")
+        self.assertEqual(sparse.json()["data"], {"name": "Desk"})
+        self.assertNotEqual(sparse["ETag"], response["ETag"])
+
+
+@override_settings(**TEST_SETTINGS)
+class ConditionalRequestTests(ProductTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.products[0]
+        self.path = f"/api/products/{self.product.pk}/"
+        self.save_at(datetime(2026, 1, 1, 12, 0, 0, 100000, tzinfo=timezone.utc))
+
+    def save_at(self, now):
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            self.product.save()
+
+    def test_not_modified_on_if_none_match(self):
+        response = self.client.get(self.path)
+
+        revalidated = self.client.get(
+            self.path, headers={"If-None-Match": response["ETag"]}
+        )
+
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+        self.assertEqual(revalidated["Last-Modified"], response["Last-Modified"])
+        self.assertEqual(revalidated["Cache-Control"], "private, no-cache")
+
+    def test_not_modified_on_if_modified_since(self):
+        response = self.client.get(self.path)
+
+        revalidated = self.client.get(
+            self.path, headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+
+        self.assertEqual(response["Last-Modified"], "Thu, 01 Jan 2026 12:00:00 GMT")
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_revalidation_of_an_uncached_product_is_not_serialized(self):
+        response = self.client.get(self.path)
+        cache.clear()
+
+        with mock.patch.object(
+            ProductRowSerializer, "to_representation"
+        ) as to_representation:
+            revalidated = self.client.get(
+                self.path, headers={"If-None-Match": response["ETag"]}
+            )
+            async_revalidated = async_to_sync(AsyncClient().get)(
+                f"/api/products/async/{self.product.pk}/",
+                headers={**self.headers, "If-None-Match": response["ETag"]},
+            )
+
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(async_revalidated.status_code, 304)
+        to_representation.assert_not_called()
+        # The ETag of a cached product is the same.
+        self.assertEqual(self.client.get(self.path)["ETag"], response["ETag"])
+        self.assertEqual(self.client.get(self.path)["ETag"], response["ETag"])
+
+    def test_etag_wins_over_last_modified_within_one_second(self):
+        response = self.client.get(self.path)
+        self.product.name = "Desk lamp"
+        self.save_at(datetime(2026, 1, 1, 12, 0, 0, 600000, tzinfo=timezone.utc))
+
+        # Both updates fall within one second, so the date alone says unchanged.
+        stale = self.client.get(
+            self.path, headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+        revalidated = self.client.get(
+            self.path,
+            headers={
+                "If-None-Match": response["ETag"],
+                "If-Modified-Since": response["Last-Modified"],
+            },
+        )
+
+        self.assertEqual(stale.status_code, 304)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(revalidated.json()["data"]["name"], "Desk lamp")
+        self.assertEqual(revalidated["Last-Modified"], response["Last-Modified"])
+        self.assertNotEqual(revalidated["ETag"], response["ETag"])
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductFieldsTests(ProductTestCase):
+    def get_product_selects(self, queries):
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT")
+            and '"products_product"' in query["sql"]
+            and "COUNT(" not in query["sql"]
+        ]
+
+    def test_list_reads_only_the_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/products/?fields=id,name")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"][0], {"id": self.products[0].pk, "name": "Lamp"}
+        )
+        [select] = self.get_product_selects(queries)
+        self.assertIn('"products_product"."name"', select)
+        self.assertNotIn('"products_product"."description"', select)
+        self.assertNotIn('"products_product"."price"', select)
+
+    def test_list_exclude(self):
+        response = self.client.get("/api/products/?exclude=description,created_at")
+
+        self.assertEqual(
+            list(response.json()["results"][0]), ["id", "name", "price", "updated_at"]
+        )
+
+    def test_cursor_pages_read_the_columns_they_need(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/products/?pagination=cursor&fields=name")
+
+        self.assertEqual(response.json()["results"][0], {"name": "Chair"})
+        [select] = self.get_product_selects(queries)
+        self.assertIn('"products_product"."created_at"', select)
+        self.assertNotIn('"products_product"."description"', select)
+
+    def test_detail(self):
+        path = f"/api/products/{self.products[1].pk}/"
+
+        self.assertEqual(
+            self.client.get(f"{path}?fields=name,price").json()["data"],
+            {"name": "Desk", "price": "120.50"},
+        )
+        self.assertEqual(
+            list(self.client.get(f"{path}?exclude=description").json()["data"]),
+            ["id", "name", "price", "created_at", "updated_at"],
+        )
+
+    def test_unknown_fields(self):
+        for path in (
+            "/api/products/?fields=name,colour",
+            f"/api/products/{self.products[0].pk}/?exclude=colour",
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    list(response.json()["errors"].values()),
+                    ["Unknown fields: colour."],
+                )
+
+    def test_at_least_one_field(self):
+        response = self.client.get(
+            "/api/products/?exclude=id,name,description,price,created_at,updated_at"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fields", response.json()["errors"])
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductCacheTests(ProductTestCase):
+    def save_product(self, pk, name):
+        product = Product.objects.get(pk=pk)
+        product.name = name
+        product.save()
+
+    def test_fill_after_a_miss_does_not_overwrite_newer_data(self):
+        pk = self.products[0].id
+        path = f"/api/products/{pk}/"
+        writes = {
+            # Evicted from the cache by the post_save signal, through the view.
+            "update": lambda: self.client.patch(path, {"name": "Updated lamp"}),
+            # Evicted from the cache by the post_save signal.
+            "save": lambda: self.save_product(pk, "Saved lamp"),
+        }
+        for label, write in writes.items():
+            with self.subTest(write=label):
+                Product.objects.filter(pk=pk).update(name="Lamp")
+                cache.clear()
+
+                def write_then_fill(products):
+                    # The write lands between the reader's query and its fill.
+                    write()
+                    fill_products(products)
+
+                with mock.patch(
+                    "products.views.fill_products", side_effect=write_then_fill
+                ):
+                    response = self.client.get(path)
+                self.assertEqual(response.json()["data"]["name"], "Lamp")
+
+                name = Product.objects.get(pk=pk).name
+                self.assertEqual(self.client.get(path).json()["data"]["name"], name)
+
+    def test_concurrent_updates_leave_the_newer_product_cached(self):
+        pk = self.products[0].id
+        path = f"/api/products/{pk}/"
+        perform_update = ProductDetailView.perform_update
+        calls = []
+
+        def interleave(view, serializer):
+            perform_update(view, serializer)
+            calls.append(serializer)
+            if len(calls) == 1:
+                # A second update commits and responds before the first one does.
+                self.client.patch(path, {"name": "Newer lamp"})
+
+        with mock.patch.object(
+            ProductDetailView, "perform_update", autospec=True, side_effect=interleave
+        ):
+            self.client.patch(path, {"name": "Older lamp"})
+
+        self.assertEqual(Product.objects.get(pk=pk).name, "Newer lamp")
+        self.assertEqual(self.client.get(path).json()["data"]["name"], "Newer lamp")
+        self.assertEqual(self.client.get(path).json()["data"]["name"], "Newer lamp")
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductCountTests(ProductTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.set(PRODUCT_COUNT_KEY, 3)
+
+    def test_count_follows_committed_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Shelf", description="", price=5)
+
+        self.assertEqual(cache.get(PRODUCT_COUNT_KEY), 4)
+
+    def test_count_ignores_rolled_back_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Product.objects.create(name="Shelf", description="", price=5)
+                    raise ValueError
+            with self.assertRaises(ValueError):
+                with deferred_invalidation(), transaction.atomic():
+                    self.products[0].delete()
+                    raise ValueError
+
+        self.assertEqual(cache.get(PRODUCT_COUNT_KEY), 3)
+
+    def test_count_can_be_left_out(self):
+        response = self.client.get("/api/products/?count=false&page_size=2")
+
+        self.assertNotIn("count", response.json())
+        self.assertIsNotNone(response.json()["next"])
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_counting_stops_at_the_limit(self):
+        with mock.patch.object(CachedCountPagination, "count_limit", 2):
+            response = self.client.get("/api/products/?min_price=0&page_size=1")
+            last_page = self.client.get("/api/products/?min_price=0&page_size=1&page=3")
+
+        # Past the limit, the count is estimated from a sample of the ids,
+        # here all of them.
+        self.assertEqual(response.json()["count"], 3)
+        self.assertTrue(response.json()["count_is_estimate"])
+        self.assertEqual(last_page.json()["count"], 3)
+        self.assertEqual(len(last_page.json()["results"]), 1)
+
+    def test_count_estimate_samples_the_ids(self):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", description="", price=i % 2)
+            for i in range(197)
+        )
+        queryset = Product.objects.filter(price__gte=1)
+        paginator = CachedCountPagination()
+        paginator.count_sample_size = 40
+        paginator.count_sample_windows = 4
+
+        with CaptureQueriesContext(connection) as queries:
+            estimate = paginator.estimate_count(queryset)
+
+        # 98 of the 200 products cost 1 or more.
+        self.assertAlmostEqual(estimate, 98, delta=15)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            paginator.estimate_count(Product.objects.all()), Product.objects.count()
+        )
+        self.assertEqual(paginator.estimate_count(Product.objects.none()), 0)
+
+    def test_cursor_links(self):
+        first = self.client.get("/api/products/?pagination=cursor&page_size=2").json()
+        second = self.client.get(first["next"]).json()
+
+        self.assertIsNone(first["previous"])
+        self.assertEqual(len(first["results"]) + len(second["results"]), 3)
+        self.assertIsNone(second["next"])
+        self.assertEqual(
+            self.client.get(second["previous"]).json()["results"], first["results"]
+        )
+
+
+@override_settings(**TEST_SETTINGS)
+class KeysetPaginationTests(ProductTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products += [
+            Product.objects.create(name=f"Shelf {i}", description="", price=i)
+            for i in range(4)
+        ]
+        # Every product shares one timestamp, so the id breaks the ties.
+        Product.objects.update(created_at=datetime(2026, 1, 1, tzinfo=timezone.utc))
+        self.ids = sorted((product.pk for product in self.products), reverse=True)
+
+    def get_ids(self, response):
+        return [product["id"] for product in response.json()["results"]]
+
+    def test_cursors_round_trip(self):
+        paginator = KeysetPagination()
+        paginator.base_url = "http://testserver/api/products/"
+        created_at = datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        product = Product(id=42, created_at=created_at)
+
+        for reverse in (False, True):
+            url = paginator.encode_cursor(product, reverse)
+            request = Request(APIRequestFactory().get(url))
+
+            self.assertEqual(
+                paginator.decode_cursor(request), ((created_at, 42), reverse)
+            )
+
+    def test_ties_on_created_at_are_paged_by_id(self):
+        pages = []
+        response = self.client.get("/api/products/?pagination=cursor&page_size=2")
+        while True:
+            pages.append(self.get_ids(response))
+            if response.json()["next"] is None:
+                break
+            response = self.client.get(response.json()["next"])
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.ids)
+
+    def test_pages_backwards(self):
+        response = self.client.get("/api/products/?pagination=cursor&page_size=3")
+        forward = [self.get_ids(response)]
+        while response.json()["next"] is not None:
+            response = self.client.get(response.json()["next"])
+            forward.append(self.get_ids(response))
+
+        backward = [self.get_ids(response)]
+        while response.json()["previous"] is not None:
+            response = self.client.get(response.json()["previous"])
+            backward.append(self.get_ids(response))
+
+        self.assertEqual(backward, forward[::-1])
+        self.assertIsNone(response.json()["previous"])
+        self.assertEqual(self.get_ids(response), self.ids[:3])
+
+    def test_tampered_cursors_are_rejected(self):
+        valid = b64encode(b'{"c":"2026-01-01T00:00:00+00:00","i":1}', b"-_")
+        for cursor in (
+            "not base64!",
+            b64encode(b"not json", b"-_"),
+            b64encode(b'{"c":"2026-01-01T00:00:00+00:00"}', b"-_"),
+            b64encode(b'{"c":"yesterday","i":1}', b"-_"),
+            b64encode(b'{"c":"2026-01-01T00:00:00+00:00","i":"one"}', b"-_"),
+            b64encode(b'["c","i"]', b"-_"),
+            valid[:-4],
+        ):
+            with self.subTest(cursor=cursor):
+                if isinstance(cursor, bytes):
+                    cursor = cursor.decode()
+                response = self.client.get("/api/products/", {"cursor": cursor})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["errors"], "Invalid cursor")
+
+        response = self.client.get("/api/products/", {"cursor": valid.decode()})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductListCacheTests(ProductTestCase):
+    def test_warm_page_skips_the_database_and_the_serializer(self):
+        path = "/api/products/?ordering=-price&page_size=2"
+        first = self.client.get(path)
+
+        with mock.patch.object(
+            ProductRowSerializer, "to_representation"
+        ) as row_serializer, mock.patch.object(
+            ProductSerializer, "to_representation"
+        ) as serializer:
+            with self.assertNumQueries(0):
+                second = self.client.get(path)
+
+        row_serializer.assert_not_called()
+        serializer.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_saving_a_product_expires_the_pages(self):
+        first = self.client.get("/api/products/")
+        self.products[0].name = "Floor lamp"
+        self.products[0].save()
+
+        second = self.client.get(
+            "/api/products/", headers={"If-None-Match": first["ETag"]}
+        )
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.json()["results"][0]["name"], "Floor lamp")
+
+
+class ProductRowSerializerTests(TestCase):
+    def test_output_matches_the_model_serializer(self):
+        aware = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        products = [
+            Product(
+                id=1,
+                name="Lamp",
+                description="",
+                price=Decimal("10"),
+                created_at=aware,
+                updated_at=aware,
+            ),
+            Product(
+                id=2,
+                name="Desk",
+                description=None,
+                price=Decimal("120.555"),
+                created_at=aware.astimezone(timezone(timedelta(hours=-5))),
+                updated_at=aware.replace(microsecond=0),
+            ),
+            Product(
+                id=3,
+                name="Chair \u2028",
+                description='Oak, "solid"',
+                price=Decimal("0.1"),
+                created_at=aware.replace(tzinfo=None),
+                updated_at=datetime(2025, 3, 1),
+            ),
+        ]
+        renderer = JSONRenderer()
+        for fields in (None, ("price", "name"), ("created_at",)):
+            row_serializer = get_product_row_serializer(fields)
+            for product in products:
+                with self.subTest(product=product.id, fields=fields):
+                    row = {
+                        source: getattr(product, source)
+                        for source in row_serializer.sources
+                    }
+                    self.assertEqual(
+                        renderer.render(row_serializer.to_representation(row)),
+                        renderer.render(ProductSerializer(product, fields=fields).data),
+                    )
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductSearchTests(ProductTestCase):
+    def search(self, text):
+        return [
+            product.id for product in ProductSearchResults(build_match_query(text))[:]
+        ]
+
+    def test_index_follows_writes(self):
+        product = Product.objects.create(
+            name="Walnut bookshelf", description="Five shelves", price=80
+        )
+        self.assertEqual(self.search("walnut"), [product.id])
+
+        product.name = "Oak bookshelf"
+        product.save()
+        self.assertEqual(self.search("walnut"), [])
+        self.assertEqual(self.search("oak"), [product.id])
+
+        Product.objects.filter(pk=product.pk).update(description="Two shelves")
+        self.assertEqual(self.search("two shelves"), [product.id])
+
+        product.delete()
+        self.assertEqual(self.search("oak"), [])
+
+        [created] = Product.objects.bulk_create(
+            [Product(name="Pine bench", description="", price=30)]
+        )
+        self.assertEqual(self.search("pine"), [created.id])
+
+    def test_ranking_and_prefixes(self):
+        in_description = Product.objects.create(
+            name="Reading chair", description="Pairs well with a desk lamp", price=90
+        )
+        lamp = self.products[0]
+
+        self.assertEqual(self.search("lam"), [lamp.id, in_description.id])
+        self.assertEqual(self.search("desk la"), [in_description.id])
+        self.assertEqual(self.search('lamp" OR "desk'), [])
+        self.assertIsNone(build_match_query("  ?! "))
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('delete-all')"
+            )
+        self.assertEqual(self.search("lamp"), [])
+        progress = []
+
+        total = rebuild_search_index(batch_size=2, progress=progress.append)
+
+        self.assertEqual(total, 3)
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(self.search("lamp"), [self.products[0].id])
+
+    def test_search_view(self):
+        response = self.client.get("/api/products/search/?q=cha&fields=id,name")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"], [{"id": self.products[2].id, "name": "Chair"}]
+        )
+        self.assertEqual(self.client.get("/api/products/search/?q=").status_code, 400)
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductBulkTests(ProductTestCase):
+    def post(self, items):
+        return self.client.post("/api/products/bulk/", items, format="json")
+
+    def test_mixed_batch(self):
+        lamp, desk, chair = self.products
+        cache.set(PRODUCT_COUNT_KEY, 3)
+        items = [
+            {"name": "Shelf", "description": "Pine", "price": "15.00"},
+            {"name": "Stool", "description": "Oak", "price": "25.00"},
+            {"id": lamp.id, "price": "12.00"},
+            {"id": desk.id, "delete": True},
+            {"id": chair.id, "delete": True},
+        ]
+
+        with mock.patch(
+            "products.cache.bump_catalog_generation"
+        ) as bump, CaptureQueriesContext(
+            connection
+        ) as queries, self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            response = self.post(items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["status"] for item in response.json()["data"]],
+            ["created", "created", "updated", "deleted", "deleted"],
+        )
+        self.assertEqual(
+            sorted(Product.objects.values_list("name", flat=True)),
+            ["Lamp", "Shelf", "Stool"],
+        )
+        self.assertEqual(Product.objects.get(pk=lamp.pk).price, Decimal("12.00"))
+        bump.assert_called_once()
+        self.assertEqual(cache.get(PRODUCT_COUNT_KEY), 3)
+        # One statement per kind of write, the deleted rows loaded in one query.
+        self.assertEqual(
+            [
+                query["sql"].split()[0]
+                for query in queries
+                if "products_product" in query["sql"]
+            ],
+            ["SELECT", "INSERT", "UPDATE", "SELECT", "DELETE"],
+        )
+        for product in (lamp, desk, chair):
+            self.assertEqual(cache.get(get_product_cache_key(product.pk)), EVICTED)
+
+    def test_invalid_batch_writes_nothing(self):
+        items = [
+            {"name": "Shelf", "description": "Pine", "price": "15.00"},
+            {"id": self.products[0].id, "price": "12.00"},
+            {"id": 999, "delete": True},
+        ]
+
+        with mock.patch("products.cache.bump_catalog_generation") as bump:
+            response = self.post(items)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"][2], {"id": "Product 999 does not exist."}
+        )
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(
+            Product.objects.get(pk=self.products[0].pk).price, Decimal("10")
+        )
+        bump.assert_not_called()
+
+
+@override_settings(**TEST_SETTINGS)
+class ProductExportTests(ProductTestCase):
+    def export(self, **params):
+        response = self.client.get("/api/products/export/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_ndjson(self):
+        response = self.export()
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [product.pk for product in self.products],
+        )
+        self.assertEqual(
+            json.loads(lines[1]),
+            {**ProductSerializer(self.products[1]).data, "price": "120.50"},
+        )
+
+    def test_csv(self):
+        response = self.export(output="csv")
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="products.csv"'
+        )
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2][:4], [str(self.products[1].pk), "Desk", "", "120.50"])
+
+    def test_gzip(self):
+        for output in ("ndjson", "csv"):
+            with self.subTest(output=output):
+                plain = b"".join(self.export(output=output).streaming_content)
+                response = self.export(output=output, gzip="true")
+
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertEqual(
+                    gzip.decompress(b"".join(response.streaming_content)), plain
+                )
+
+    def test_requires_an_admin(self):
+        user = User.objects.create_user("joe@example.com", "Joe", True, "pw")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}"
+        )
+
+        self.assertEqual(self.client.get("/api/products/export/").status_code, 403)
+
+    def test_invalid_output(self):
+        response = self.client.get("/api/products/export/", {"output": "xml"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("output", response.json()["errors"])
+
+
+class JSONRendererTests(TestCase):
+    def render(self, data, media_type=None):
+        return JSONRenderer().render(data, media_type)
+
+    def render_with_drf(self, data, media_type=None):
+        return renderers.JSONRenderer().render(data, media_type)
+
+    def test_matches_drf_on_a_typical_payload(self):
+        data = {
+            "success": True,
+            "message": gettext_lazy("Products fetched successfully"),
+            "count": 2,
+            "next": None,
+            "results": [
+                {
+                    "id": 1,
+                    "name": "Café lamp",
+                    "price": "10.50",
+                    "ratio": 0.25,
+                    "tags": ["a", "b"],
+                    "day": date(2026, 1, 1),
+                    "uuid": uuid.UUID(int=1),
+                },
+                {"id": 2, "name": "Desk", "price": "120.00", "ratio": 1.5, "tags": []},
+            ],
+            "errors": {"name": [ErrorDetail("This field is required.", "required")]},
+            7: "non-string key",
+        }
+
+        self.assertEqual(self.render(data), self.render_with_drf(data))
+
+    def test_decimals(self):
+        data = {"price": Decimal("10.50"), "prices": [Decimal("0.1"), Decimal("3")]}
+
+        self.assertEqual(self.render(data), b'{"price":10.5,"prices":[0.1,3.0]}')
+        self.assertEqual(self.render(data), self.render_with_drf(data))
+
+    def test_datetimes(self):
+        moment = datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            self.render({"at": moment}), b'{"at":"2026-01-01T12:30:15.123456Z"}'
+        )
+        self.assertEqual(
+            self.render({"at": moment.replace(tzinfo=None)}),
+            b'{"at":"2026-01-01T12:30:15.123456"}',
+        )
+        self.assertEqual(
+            self.render({"at": moment.astimezone(timezone(timedelta(hours=2)))}),
+            b'{"at":"2026-01-01T14:30:15.123456+02:00"}',
+        )
+
+    def test_line_terminators_are_escaped(self):
+        data = {"name": "a\u2028b\u2029c"}
+
+        self.assertEqual(self.render(data), b'{"name":"a\\u2028b\\u2029c"}')
+        self.assertEqual(self.render(data), self.render_with_drf(data))
+
+    def test_lazy_strings_and_error_details(self):
+        data = {
+            "detail": gettext_lazy("Not found."),
+            "errors": [ErrorDetail("Invalid cursor", "invalid")],
+        }
+
+        self.assertEqual(
+            self.render(data), b'{"detail":"Not found.","errors":["Invalid cursor"]}'
+        )
+
+    def test_indented_output_and_none(self):
+        data = {"results": [{"id": 1}]}
+        media_type = "application/json; indent=2"
+
+        self.assertEqual(
+            self.render(data, media_type), self.render_with_drf(data, media_type)
+        )
+        self.assertIn(b"\n  ", self.render(data, media_type))
+        self.assertEqual(self.render(None), b"")
+
+
+class CompressionMiddlewareTests(TestCase):
+    body = b'{"name": "Lamp", "price": "10.00"}' * 100
+
+    def get(self, accept_encoding, response=None):
+        if response is None:
+            response = HttpResponse(self.body, content_type="application/json")
+        middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get(
+            "/", headers={"Accept-Encoding": accept_encoding}
+        )
+        return middleware(request)
+
+    def test_encoding_negotiation(self):
+        for header, encoding in (
+            ("gzip, deflate, br, zstd", "zstd"),
+            ("gzip, br", "br"),
+            ("gzip", "gzip"),
+            ("br;q=0.5, gzip;q=1.0", "gzip"),
+            ("zstd;q=0, br;q=0.8, gzip;q=0.8", "br"),
+            ("*", "zstd"),
+            ("*;q=0.5, zstd;q=0, br;q=0", "gzip"),
+            ("gzip;q=0, *;q=0", None),
+            ("identity", None),
+            ("identity;q=1, gzip;q=0.5", None),
+            ("gzip, identity;q=0.5", "gzip"),
+            ("", None),
+        ):
+            with self.subTest(header=header):
+                response = self.get(header)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_compressed_content(self):
+        decompress = {
+            "zstd": lambda data: zstandard.ZstdDecompressor()
+            .decompressobj()
+            .decompress(data),
+            "br": brotli.decompress,
+            "gzip": gzip.decompress,
+        }
+        for encoding, function in decompress.items():
+            with self.subTest(encoding=encoding):
+                response = self.get(encoding)
+                self.assertEqual(function(response.content), self.body)
+                self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+    def test_strong_etags_become_weak(self):
+        response = HttpResponse(self.body, content_type="application/json")
+        response["ETag"] = '"abc"'
+
+        self.assertEqual(self.get("gzip", response)["ETag"], 'W/"abc"')
+
+    def test_streaming_responses(self):
+        response = StreamingHttpResponse(iter([b"a,b\n"] * 10), content_type="text/csv")
+
+        response = self.get("gzip", response)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response)), b"a,b\n" * 10)
+
+    def test_responses_left_alone(self):
+        encoded = HttpResponse(
+            gzip.compress(self.body), content_type="application/json"
+        )
+        encoded["Content-Encoding"] = "gzip"
+        small = HttpResponse(b'{"success": true}', content_type="application/json")
+        binary = HttpResponse(self.body, content_type="image/png")
+
+        for label, response in (
+            ("encoded", encoded),
+            ("small", small),
+            ("binary", binary),
+        ):
+            with self.subTest(response=label):
+                content = response.content
+                response = self.get("zstd, br, gzip", response)
+                self.assertEqual(response.content, content)
+                self.assertIn(response.get("Content-Encoding"), (None, "gzip"))
+
+
+@override_settings(**TEST_SETTINGS)
+class CreateProductsCommandTests(TestCase):
+    def test_existing_users_are_not_counted(self):
+        User.objects.create_user("loadtest1@example.com", "Jane", True, "password")
+        out = StringIO()
+
+        call_command(
+            "create_products", "--count", "0", "--users", "3", "--seed", "1", stdout=out
+        )
+
+        self.assertIn("Successfully created 2 users", out.getvalue())
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, "0 is not a positive integer"):
+            call_command("create_products", "--batch-size", "0")
+
+    def test_counts_must_not_be_negative(self):
+        for option in ("--count", "--users"):
+            with self.subTest(option=option):
+                with self.assertRaisesMessage(
+                    CommandError, "-1 is not a non-negative integer"
+                ):
+                    call_command("create_products", option, "-1")
+        with self.assertRaisesMessage(CommandError, "0 is not a positive integer"):
+            call_command("create_products", "--workers", "0")
+        self.assertFalse(Product.objects.exists())
@@ -1,14 +1,37 @@
 from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
 from rest_framework import permissions
-from rest_framework.generics import (ListCreateAPIView,
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (GenericAPIView, ListCreateAPIView,
                                      RetrieveUpdateDestroyAPIView)
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
-from common.pagination import Pagination
+from common.async_cache import async_cache
+from common.async_views import AsyncGenericAPIView
+from common.conditional import not_modified_response, set_validators
+from common.fieldsets import get_requested_fields
+from common.pagination import (CachedCountPagination, KeysetPagination,
+                               Pagination, select_pagination_class)
 from common.response import error_response, success_response
 
+from .cache import (PRODUCT_LIST_CACHE_TIMEOUT, adjust_product_count,
+                    afill_products, aget_cached_product,
+                    aget_product_count_cache_key,
+                    aget_product_list_fingerprint, deferred_invalidation,
+                    evict_products, fill_products, get_cached_product,
+                    get_cached_products, get_product_count_cache_key,
+                    get_product_list_cache_key, get_product_list_fingerprint,
+                    invalidate_product_caches)
+from .export import (csv_lines, encode_chunks, gzip_chunks, iter_products,
+                     ndjson_lines)
+from .filters import ProductFilter, ProductOrdering
 from .models import Product
-from .serializers import ProductSerializer
+from .search import ProductSearchResults, build_match_query
+from .serializers import (ProductBulkSerializer, ProductSerializer,
+                          get_product_row_serializer)
 
 
 class IsSuperUser(permissions.BasePermission):
@@ -22,18 +45,87 @@ class IsSuperUser(permissions.BasePermission):
         return request.user.is_admin
 
 
-class ProductListView(ListCreateAPIView):
+class ProductListMixin:
+    """
+    Querying, filtering and pagination of the product list, shared by the sync
+    and async list views.
+    """
+
+    queryset = Product.objects.order_by("id")
+    serializer_class = ProductSerializer
+    pagination_class = CachedCountPagination
+    cursor_pagination_class = KeysetPagination
+    filter_backends = [ProductFilter, ProductOrdering]
+    ordering_fields = ["id", "name", "price", "created_at", "updated_at"]
+    ordering = ["id"]
+
+    @property
+    def paginator(self):
+        """
+        Returns the paginator chosen for this request, see `select_pagination_class`.
+        """
+        if not hasattr(self, "_paginator"):
+            pagination_class = select_pagination_class(
+                self.request, self.pagination_class, self.cursor_pagination_class
+            )
+            self._paginator = pagination_class()
+        return self._paginator
+
+    def get_count_cache_key(self):
+        """
+        Cache key of the total count used by `CachedCountPagination`.
+        """
+        return get_product_count_cache_key(self.request, ProductFilter.params)
+
+    def get_rows(self, request):
+        """
+        Returns the row serializer of the requested fields and the filtered
+        `.values()` queryset of the rows it needs.
+        """
+        fields = get_requested_fields(request, get_product_row_serializer().field_names)
+        row_serializer = get_product_row_serializer(tuple(fields))
+        # Only the selected columns are read, plus what the paginator needs.
+        columns = dict.fromkeys(
+            [
+                *row_serializer.sources,
+                *getattr(self.paginator, "required_fields", ()),
+            ]
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        return row_serializer, queryset.values(*columns)
+
+    def render_content(self, response):
+        return self.request.accepted_renderer.render(
+            response.data,
+            self.request.accepted_media_type,
+            self.get_renderer_context(),
+        )
+
+    def get_rendered_response(self, content):
+        """
+        Wraps already rendered bytes in a response with the negotiated content type.
+        """
+        renderer = self.request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        return HttpResponse(content, content_type=content_type)
+
+
+class ProductListView(ProductListMixin, ListCreateAPIView):
     """
     API view to list and create products.
 
     - GET: Returns a paginated list of products. Requires authentication.
+      Filter with the parameters of `ProductFilter` and sort with `?ordering=`
+      (`id`, `name`, `price`, `created_at`, `updated_at`, `-` for descending).
+      Send `?pagination=cursor` (or a `cursor`) for keyset pagination, which
+      always walks newest first and ignores `ordering`, or `?count=false` to
+      leave out the total count. `?fields=` and `?exclude=` limit the fields
+      returned, and the columns read.
     - POST: Creates a new product. Requires authentication and admin privileges.
     """
 
-    queryset = Product.objects.all()
-    serializer_class = ProductSerializer
-    pagination_class = Pagination
-
     def get_permissions(self):
         """
         Defines permission requirements for different request methods.
@@ -44,43 +136,48 @@ class ProductListView(ListCreateAPIView):
             return [IsAuthenticated(), IsSuperUser()]
         return super().get_permissions()
 
-    def get_queryset(self):
-        """
-        Retrieves products from cache if available; otherwise, fetches from the database
-        and caches the result for 15 minutes.
-        """
-        cache_key = "products_list"
-        cached_products = cache.get(cache_key)
-
-        if cached_products:
-            return Product.objects.filter(id__in=cached_products)
-
-        queryset = Product.objects.all()
-        cache.set(
-            cache_key, list(queryset.values_list("id", flat=True)), timeout=60 * 15
-        )
-
-        print(cache.get("products_list"))
-
-        return queryset
-
     def list(self, request, *args, **kwargs):
         """
         Handles GET requests to fetch the product list.
+
+        Pages carry an ETag built from the catalog generation, so a client revalidating
+        an unchanged page gets a 304. JSON pages are cached as rendered bytes for the
+        current generation, so a warm page skips the database and the serializer.
         """
         try:
             self.check_permissions(request)
-            queryset = self.get_queryset()
-            page = self.paginate_queryset(queryset)
+
+            fingerprint = get_product_list_fingerprint(request)
+            etag = quote_etag(fingerprint)
+            not_modified = not_modified_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            cache_key = None
+            if request.accepted_renderer.format == "json":
+                cache_key = get_product_list_cache_key(fingerprint)
+                content = cache.get(cache_key)
+                if content is not None:
+                    return set_validators(self.get_rendered_response(content), etag)
+
+            row_serializer, rows = self.get_rows(request)
+            page = self.paginate_queryset(rows)
 
             if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
+                response = self.get_paginated_response(row_serializer.many(page))
+            else:
+                response = success_response(
+                    message="Products fetched successfully",
+                    data=row_serializer.many(rows),
+                )
 
-            serializer = self.get_serializer(queryset, many=True)
-            return success_response(
-                message="Products fetched successfully", data=serializer.data
-            )
+            if cache_key is not None:
+                content = self.render_content(response)
+                cache.set(cache_key, content, timeout=PRODUCT_LIST_CACHE_TIMEOUT)
+                response = self.get_rendered_response(content)
+            return set_validators(response, etag)
+        except ValidationError as e:
+            return error_response(message="Error fetching products", errors=e.detail)
         except Exception as e:
             return error_response(message="Error fetching products", errors=str(e))
 
@@ -98,7 +195,42 @@ class ProductListView(ListCreateAPIView):
             return error_response(message="Error creating product", errors=str(e))
 
 
-class ProductDetailView(RetrieveUpdateDestroyAPIView):
+class ProductDetailMixin:
+    """
+    Reading of a single product, shared by the sync and async detail views.
+    """
+
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+
+    def get_row(self):
+        """
+        Returns the `.values()` queryset of the requested product, with every field.
+
+        Unlike the list, a detail read is not narrowed to `?fields=`: the row
+        read on a miss fills the product cache, which then answers any field
+        selection for that product.
+        """
+        row_serializer = get_product_row_serializer()
+        return (
+            self.get_queryset()
+            .filter(pk=self.kwargs["pk"])
+            .values(*row_serializer.sources)
+        )
+
+    def get_validators(self, pk, updated_at, fields):
+        """
+        Returns the `(etag, last_modified)` of a product from its id and
+        `updated_at`, so a revalidation is answered before it is serialized.
+        """
+        # The full product is cached, a sparse response gets its own ETag.
+        etag = f"{pk}-{updated_at.timestamp()}"
+        if len(fields) < len(get_product_row_serializer().field_names):
+            etag = f"{etag}-{'.'.join(fields)}"
+        return quote_etag(etag), int(updated_at.timestamp())
+
+
+class ProductDetailView(ProductDetailMixin, RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a product.
 
@@ -107,9 +239,6 @@ class ProductDetailView(RetrieveUpdateDestroyAPIView):
     - DELETE: Delete a product. Requires authentication and admin privileges.
     """
 
-    queryset = Product.objects.all()
-    serializer_class = ProductSerializer
-
     def get_permissions(self):
         """
         Defines permission requirements for different request methods.
@@ -121,12 +250,46 @@ class ProductDetailView(RetrieveUpdateDestroyAPIView):
     def retrieve(self, request, *args, **kwargs):
         """
         Handles GET requests to retrieve product details.
+
+        The serialized product is read through the product cache, and its
+        `updated_at` is used as ETag/Last-Modified, so a revalidation of an
+        unchanged product gets a 304.
         """
         try:
-            product = self.get_object()
-            serializer = self.get_serializer(product)
-            return success_response(
-                message="Product details fetched successfully", data=serializer.data
+            fields = get_requested_fields(
+                request, get_product_row_serializer().field_names
+            )
+            data = get_cached_product(self.kwargs["pk"])
+            if data is None:
+                row = self.get_row().first()
+                if row is None:
+                    raise Http404("No Product matches the given query.")
+                updated_at = row["updated_at"]
+            else:
+                updated_at = parse_datetime(data["updated_at"])
+
+            etag, last_modified = self.get_validators(
+                self.kwargs["pk"], updated_at, fields
+            )
+            not_modified = not_modified_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if not_modified is not None:
+                return not_modified
+
+            if data is None:
+                # Only serialized once a body is needed.
+                data = get_product_row_serializer().to_representation(row)
+                fill_products([data])
+
+            response = success_response(
+                message="Product details fetched successfully",
+                data={name: data[name] for name in fields},
+            )
+            return set_validators(response, etag, last_modified)
+        except ValidationError as e:
+            return error_response(
+                message="Error fetching product details", errors=e.detail
             )
         except Exception as e:
             return error_response(
@@ -136,6 +299,9 @@ class ProductDetailView(RetrieveUpdateDestroyAPIView):
     def update(self, request, *args, **kwargs):
         """
         Handles PUT/PATCH requests to update a product.
+        The product is evicted from the product cache by the post_save signal,
+        and the next read fills it again, so two concurrent updates cannot leave
+        the older one cached.
         """
         try:
             response = super().update(request, *args, **kwargs)
@@ -148,9 +314,276 @@ class ProductDetailView(RetrieveUpdateDestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         """
         Handles DELETE requests to remove a product.
+        The product is evicted from the product cache.
         """
         try:
             response = super().destroy(request, *args, **kwargs)
+            evict_products([self.kwargs["pk"]])
             return success_response(message="Product deleted successfully", data={})
         except Exception as e:
             return error_response(message="Error deleting product", errors=str(e))
+
+
+class AsyncProductListView(ProductListMixin, AsyncGenericAPIView):
+    """
+    Async version of the product list, GET only, for ASGI servers.
+
+    Same parameters, pages and ETags as `ProductListView`, served with the
+    async ORM and the async cache client, so a request waiting on the database
+    or Redis does not hold a thread.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    async def aget_count_cache_key(self):
+        """
+        Async version of `get_count_cache_key()`.
+        """
+        return await aget_product_count_cache_key(self.request, ProductFilter.params)
+
+    async def get(self, request):
+        try:
+            fingerprint = await aget_product_list_fingerprint(request)
+            etag = quote_etag(fingerprint)
+            not_modified = not_modified_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            cache_key = get_product_list_cache_key(fingerprint)
+            content = await async_cache.get(cache_key)
+            if content is not None:
+                return set_validators(self.get_rendered_response(content), etag)
+
+            row_serializer, rows = self.get_rows(request)
+            page = await self.paginator.apaginate_queryset(rows, request, view=self)
+
+            if page is not None:
+                response = self.get_paginated_response(row_serializer.many(page))
+            else:
+                response = success_response(
+                    message="Products fetched successfully",
+                    data=row_serializer.many([row async for row in rows]),
+                )
+
+            content = self.render_content(response)
+            await async_cache.set(
+                cache_key, content, timeout=PRODUCT_LIST_CACHE_TIMEOUT
+            )
+            return set_validators(self.get_rendered_response(content), etag)
+        except ValidationError as e:
+            return error_response(message="Error fetching products", errors=e.detail)
+        except Exception as e:
+            return error_response(message="Error fetching products", errors=str(e))
+
+
+class AsyncProductDetailView(ProductDetailMixin, AsyncGenericAPIView):
+    """
+    Async version of the product details, GET only, for ASGI servers.
+    Same responses and ETags as `ProductDetailView`.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, pk):
+        try:
+            fields = get_requested_fields(
+                request, get_product_row_serializer().field_names
+            )
+            data = await aget_cached_product(pk)
+            if data is None:
+                row = await self.get_row().afirst()
+                if row is None:
+                    raise Http404("No Product matches the given query.")
+                updated_at = row["updated_at"]
+            else:
+                updated_at = parse_datetime(data["updated_at"])
+
+            etag, last_modified = self.get_validators(pk, updated_at, fields)
+            not_modified = not_modified_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if not_modified is not None:
+                return not_modified
+
+            if data is None:
+                data = get_product_row_serializer().to_representation(row)
+                await afill_products([data])
+
+            response = success_response(
+                message="Product details fetched successfully",
+                data={name: data[name] for name in fields},
+            )
+            return set_validators(response, etag, last_modified)
+        except ValidationError as e:
+            return error_response(
+                message="Error fetching product details", errors=e.detail
+            )
+        except Exception as e:
+            return error_response(
+                message="Error fetching product details", errors=str(e)
+            )
+
+
+class ProductBulkView(APIView):
+    """
+    API view to fetch, create, update and delete many products in one request.
+
+    - GET: Returns the products listed in `?ids=1,2,3`, read from the product cache
+      in one round trip. Requires authentication.
+    - POST: Accepts a JSON array of up to `max_items` products, see
+      `ProductBulkSerializer`. Requires authentication and admin privileges.
+    """
+
+    max_items = 1000
+
+    def get_permissions(self):
+        """
+        Defines permission requirements for different request methods.
+        """
+        if self.request.method == "GET":
+            return [IsAuthenticated()]
+        return [IsAuthenticated(), IsSuperUser()]
+
+    def get(self, request):
+        try:
+            ids = [
+                int(pk) for pk in request.query_params.get("ids", "").split(",") if pk
+            ]
+        except ValueError:
+            return error_response(
+                message="Error fetching products",
+                errors={"ids": "Expected a comma separated list of ids."},
+            )
+        ids = list(dict.fromkeys(ids))[: self.max_items]
+
+        try:
+            fields = get_requested_fields(
+                request, get_product_row_serializer().field_names
+            )
+            products = get_cached_products(ids)
+            missing = [pk for pk in ids if pk not in products]
+            if missing:
+                row_serializer = get_product_row_serializer()
+                fetched = row_serializer.many(
+                    Product.objects.filter(id__in=missing).values(
+                        *row_serializer.sources
+                    )
+                )
+                fill_products(fetched)
+                products.update((data["id"], data) for data in fetched)
+
+            return success_response(
+                message="Products fetched successfully",
+                data=[
+                    {name: products[pk][name] for name in fields}
+                    for pk in ids
+                    if pk in products
+                ],
+            )
+        except ValidationError as e:
+            return error_response(message="Error fetching products", errors=e.detail)
+        except Exception as e:
+            return error_response(message="Error fetching products", errors=str(e))
+
+    def post(self, request):
+        serializer = ProductBulkSerializer(
+            data=request.data, many=True, partial=True, max_length=self.max_items
+        )
+        if not serializer.is_valid():
+            return error_response(
+                message="Error syncing products", errors=serializer.errors
+            )
+
+        try:
+            # One cache invalidation for the whole batch, after the commit.
+            # Bulk creates and updates send no signals, deletes do.
+            with deferred_invalidation():
+                results = serializer.save()
+                invalidate_product_caches(
+                    [item["id"] for item in results if item["status"] == "updated"]
+                )
+                adjust_product_count(
+                    sum(item["status"] == "created" for item in results)
+                )
+            return success_response(
+                message="Products synced successfully", data=results
+            )
+        except Exception as e:
+            return error_response(message="Error syncing products", errors=str(e))
+
+
+class ProductSearchView(GenericAPIView):
+    """
+    API view to search products by name and description.
+
+    - GET: Returns the products matching every word of `?q=`, best match first,
+      paginated like the product list. Requires authentication.
+    """
+
+    serializer_class = ProductSerializer
+    pagination_class = Pagination
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        match_query = build_match_query(request.query_params.get("q", ""))
+        if match_query is None:
+            return error_response(
+                message="Error searching products",
+                errors={"q": "This field is required."},
+            )
+
+        try:
+            fields = get_requested_fields(
+                request, get_product_row_serializer().field_names
+            )
+            results = ProductSearchResults(
+                match_query, columns=get_product_row_serializer(tuple(fields)).sources
+            )
+            page = self.paginate_queryset(results)
+            serializer = self.get_serializer(page, many=True, fields=fields)
+            return self.get_paginated_response(serializer.data)
+        except ValidationError as e:
+            return error_response(message="Error searching products", errors=e.detail)
+        except Exception as e:
+            return error_response(message="Error searching products", errors=str(e))
+
+
+class ProductExportView(APIView):
+    """
+    API view to stream the whole product catalog.
+
+    - GET: Streams every product as NDJSON (`?output=ndjson`, the default) or CSV
+      (`?output=csv`), gzip compressed with `?gzip=true`. Requires authentication
+      and admin privileges.
+    """
+
+    permission_classes = [IsAuthenticated, IsSuperUser]
+    chunk_size = 2000
+    formats = {
+        "ndjson": ("application/x-ndjson", ndjson_lines),
+        "csv": ("text/csv", csv_lines),
+    }
+
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in self.formats:
+            return error_response(
+                message="Error exporting products",
+                errors={"output": f"Choose one of: {', '.join(self.formats)}."},
+            )
+
+        content_type, format_lines = self.formats[output]
+        stream = encode_chunks(format_lines(iter_products(self.chunk_size)))
+        filename = f"products.{output}"
+
+        compress = request.query_params.get("gzip", "").lower() in ("1", "true")
+        if compress:
+            stream = gzip_chunks(stream)
+
+        response = StreamingHttpResponse(
+            stream, content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        return response